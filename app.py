@@ -3,8 +3,6 @@ import uuid
 from datetime import datetime, date, timedelta
 from collections import defaultdict
 
-import pandas as pd
-
 from flask import (
     Flask, render_template, request, redirect, url_for,
     flash, jsonify, session, abort
@@ -13,12 +11,15 @@ from flask_login import (
     LoginManager, login_user, logout_user,
     login_required, current_user
 )
-from sqlalchemy import func, text
+import click
+from sqlalchemy import func, text, inspect
+from sqlalchemy.schema import CreateColumn
 
 from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 
 from config import config
-from models import db, User, Upload, SalesRecord
+from models import db, configure_engines, User, Upload, SalesRecord
+from utils import context
 
 
 # ─────────────────────────────────────────────────
@@ -54,6 +55,8 @@ def create_app(config_name='default'):
         return "File too large (413). Try a smaller CSV or increase MAX_CONTENT_LENGTH.", 413
 
     db.init_app(app)
+    with app.app_context():
+        configure_engines(app.config['SQLITE_BUSY_TIMEOUT_MS'])
 
     login_manager = LoginManager(app)
     login_manager.login_view = 'auth.login'
@@ -63,7 +66,8 @@ def create_app(config_name='default'):
     @login_manager.user_loader
     def load_user(user_id):
         # SQLAlchemy 2.0: Query.get is legacy but still works
-        return User.query.get(int(user_id))
+        user_id = int(user_id)
+        return context.cached_row('user', user_id, lambda: User.query.get(user_id))
 
     # ✅ Helpful logging specifically for /upload requests (no code change in blueprint required)
     @app.before_request
@@ -87,11 +91,124 @@ def create_app(config_name='default'):
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
 
+    # Schema + admin are a one-time deploy step (`flask --app app bootstrap`),
+    # not something every worker should redo on boot
+    @app.cli.command('bootstrap')
+    def bootstrap_command():
+        """Create tables and indexes and seed the default admin."""
+        bootstrap(app)
+        print('✅ Database ready')
+
+    @app.cli.command('backfill-columnar')
+    def backfill_columnar_command():
+        """Write the columnar and suggest files of uploads ingested before they existed."""
+        from utils.columnar import SCHEMA, columnar_path, write_columnar, write_table
+        from utils.suggest import build_index, suggest_path
+        cols = [getattr(SalesRecord, name) for name in SCHEMA.names]
+        for upload in Upload.query.filter_by(rows_archived=False).order_by(Upload.id):
+            path    = columnar_path(app.config['UPLOAD_FOLDER'], upload.stored_name)
+            suggest = suggest_path(app.config['UPLOAD_FOLDER'], upload.stored_name)
+            if os.path.exists(path) and os.path.exists(suggest):
+                continue
+            rows = [r._asdict() for r in (SalesRecord.query.filter_by(upload_id=upload.id)
+                                          .with_entities(*cols).order_by(SalesRecord.id))]
+            for target, write in ((path, lambda p: write_columnar(p, rows)),
+                                  (suggest, lambda p: write_table(p, build_index(rows)))):
+                if not os.path.exists(target):
+                    write(target)
+                    print(f'✅ {upload.original_name}: {len(rows):,} rows → {os.path.basename(target)}')
+
+    @app.cli.command('retention')
+    @click.option('--dry-run', is_flag=True, help='Only list what would be done.')
+    @click.option('--force', is_flag=True, help='Run outside RETENTION_WINDOW.')
+    @click.option('--no-vacuum', is_flag=True, help='Skip VACUUM / ANALYZE.')
+    def retention_command(dry_run, force, no_vacuum):
+        """Compress / archive inactive uploads per user policy, then vacuum."""
+        from utils import retention
+        if not force and not retention.in_window(app.config['RETENTION_WINDOW'],
+                                                 datetime.now().hour):
+            print(f"⏸  Outside RETENTION_WINDOW ({app.config['RETENTION_WINDOW']}) — nothing done")
+            return
+        for line in retention.run_retention(app.config, dry_run=dry_run):
+            print(line)
+        if not dry_run and not no_vacuum:
+            print(retention.vacuum(app.config['RETENTION_VACUUM_PAGES']))
+
+    return app
+
+
+def bootstrap(app):
+    """Idempotent: safe to run on every deploy."""
     with app.app_context():
         db.create_all()
+        _ensure_columns()
+        _migrate_money(app)
+        _ensure_indexes()
         _seed_admin(app)
 
-    return app
+
+def _ensure_columns():
+    """create_all() skips existing tables — add columns newer models gained."""
+    with db.engine.begin() as conn:
+        insp = inspect(conn)
+        for table in db.metadata.sorted_tables:
+            have = {c['name'] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in have:
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+
+
+# Float rupee columns of older databases → their integer paise successors
+_MONEY_COLUMNS = {
+    'uploads':       {'total_amount': 'total_amount_paise'},
+    'sales_records': {'amount': 'amount_paise', 'price_per_unit': 'price_per_unit_paise'},
+    'sales_samples': {'amount': 'amount_paise'},
+}
+
+
+def _migrate_money(app):
+    """
+    Move to integer paise (utils/money.py): fill the new paise columns
+    from the old Float ones and drop those, then rewrite any upload file
+    that still carries float amounts. No-op once everything is current.
+    """
+    migrated = []
+    with db.engine.begin() as conn:
+        insp = inspect(conn)
+        for table, renames in _MONEY_COLUMNS.items():
+            old = [c['name'] for c in insp.get_columns(table) if c['name'] in renames]
+            if not old:
+                continue
+            sets = ', '.join(f'{renames[c]} = CAST(ROUND({c} * 100) AS BIGINT)' for c in old)
+            conn.exec_driver_sql(f'UPDATE {table} SET {sets}')
+            for index in insp.get_indexes(table):
+                if set(index['column_names']) & set(old):
+                    conn.exec_driver_sql(f'DROP INDEX {index["name"]}')
+            for column in old:
+                conn.exec_driver_sql(f'ALTER TABLE {table} DROP COLUMN {column}')
+            migrated.append(table)
+        if migrated:
+            # stored responses were summed from floats
+            conn.exec_driver_sql('DELETE FROM dashboard_payloads')
+
+    from utils.columnar import migrate_money
+    from utils.retention import upload_paths
+    files = 0
+    for upload in Upload.query.order_by(Upload.id):
+        paths = upload_paths(app.config['UPLOAD_FOLDER'], upload.stored_name)
+        for key, compression in (('columnar', None), ('archive', 'zstd')):
+            if os.path.exists(paths[key]):
+                files += migrate_money(paths[key], compression)
+    if migrated or files:
+        print(f'✅ Money stored as integer paise ({len(migrated)} tables, {files} upload files migrated)')
+
+
+def _ensure_indexes():
+    """create_all() skips existing tables — add any indexes they are missing."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
 
 
 def _seed_admin(app):
@@ -110,8 +227,9 @@ def _seed_admin(app):
             print('✅ Default admin created → admin ')
 
 
-app = create_app()
+app = create_app(os.environ.get('FLASK_CONFIG', 'default'))
 
 if __name__ == '__main__':
+    bootstrap(app)
     # ✅ More stable dev run config
     app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
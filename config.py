@@ -5,15 +5,79 @@ load_dotenv()
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+DATABASE_URL = os.environ.get('DATABASE_URL') or \
+    'sqlite:///' + os.path.join(BASE_DIR, 'instance', 'kaadu.db')
+if DATABASE_URL.startswith('postgres://'):          # Heroku-style URL
+    DATABASE_URL = 'postgresql://' + DATABASE_URL[len('postgres://'):]
+IS_SQLITE = DATABASE_URL.startswith('sqlite')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30_000))
+
+
+def _engine_options():
+    """SQLite: wait on locks instead of failing. Server DBs: a tuned, self-healing pool."""
+    if IS_SQLITE:
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        'pool_size':     int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow':  int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout':  int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle':  int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+
+def _read_bind():
+    """
+    Separate engine for read-only queries (see models.RoutingSession):
+    a read-only connection pool on the same file for SQLite, or
+    DATABASE_READ_URL (e.g. a replica) for server databases.
+    """
+    if IS_SQLITE:
+        path = DATABASE_URL[len('sqlite:///'):]
+        if not path or path == ':memory:':
+            return {}
+        return {'read': {'url': f'sqlite:///file:{path}?mode=ro&uri=true', **_engine_options()}}
+    if os.environ.get('DATABASE_READ_URL'):
+        return {'read': {'url': os.environ['DATABASE_READ_URL'], **_engine_options()}}
+    return {}
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'kaadu-organic-secret-key-2024-change-in-production'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
-        'sqlite:///' + os.path.join(BASE_DIR, 'instance', 'kaadu.db')
+    SQLALCHEMY_DATABASE_URI = DATABASE_URL
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options()
+    SQLALCHEMY_BINDS = _read_bind()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
+    SQLITE_BUSY_TIMEOUT_MS = SQLITE_BUSY_TIMEOUT_MS
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(BASE_DIR, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max
     ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
     RECORDS_PER_PAGE = 50
+    # Process-pool size for multi-file uploads (defaults to CPU cores)
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 0)) or None
+    # Uploads with at least this many rows also get HLL sketches and a
+    # stratified sample at ingest, enabling ?approx=1 on the API
+    APPROX_MIN_ROWS    = int(os.environ.get('APPROX_MIN_ROWS', 200_000))
+    APPROX_SAMPLE_SIZE = int(os.environ.get('APPROX_SAMPLE_SIZE', 50_000))
+    # 'columnar' serves the dashboard aggregates from each upload's
+    # memory-mapped Arrow file; 'sql' always scans sales_records
+    ANALYTICS_BACKEND = os.environ.get('ANALYTICS_BACKEND', 'columnar')
+    # Retention of inactive uploads (`flask --app app retention`, from cron).
+    # Days since the upload was last active; 0 = never. Users can override
+    # them with a RetentionPolicy (/api/retention-policy).
+    RETENTION_COMPRESS_RAW_DAYS = int(os.environ.get('RETENTION_COMPRESS_RAW_DAYS', 7))
+    RETENTION_DELETE_RAW_DAYS   = int(os.environ.get('RETENTION_DELETE_RAW_DAYS', 0))
+    RETENTION_ARCHIVE_ROWS_DAYS = int(os.environ.get('RETENTION_ARCHIVE_ROWS_DAYS', 0))
+    # Hours (server local, 'start-end') the job may run in, e.g. '1-5';
+    # empty = any time. VACUUM work per run is capped at this many pages.
+    RETENTION_WINDOW       = os.environ.get('RETENTION_WINDOW', '')
+    RETENTION_VACUUM_PAGES = int(os.environ.get('RETENTION_VACUUM_PAGES', 20_000))
+    # Seconds a worker reuses the logged-in user and their active upload
+    # without querying (0 = off); switching / uploading / deleting bump a
+    # per-user version in CONTEXT_VERSION_FILE so no worker serves stale ones
+    CONTEXT_CACHE_TTL    = int(os.environ.get('CONTEXT_CACHE_TTL', 30))
+    CONTEXT_VERSION_FILE = os.environ.get('CONTEXT_VERSION_FILE') or \
+        os.path.join(BASE_DIR, 'instance', 'context-versions')
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -0,0 +1,49 @@
+# ─────────────────────────────────────────
+#  Kaadu Dashboard — gunicorn production config
+#  Picked up automatically by `gunicorn` run from the project root.
+#  Every value can be overridden from the environment.
+# ─────────────────────────────────────────
+import os
+import multiprocessing
+
+os.environ.setdefault('FLASK_CONFIG', 'production')
+
+wsgi_app = 'app:app'
+bind     = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# SQLite has a single writer no matter how many processes there are, so
+# keep the process count modest there; server databases can take more.
+_sqlite = (os.environ.get('DATABASE_URL') or 'sqlite').startswith('sqlite')
+_cores  = multiprocessing.cpu_count()
+workers = int(os.environ.get('WEB_CONCURRENCY',
+                             min(_cores, 4) if _sqlite else _cores * 2 + 1))
+worker_class = 'gthread'
+threads      = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Every worker has its own ingest process pool; share the cores between
+# them rather than giving each worker all of them
+os.environ.setdefault('INGEST_WORKERS', str(max(1, _cores // workers)))
+
+# Uploads parse and ingest inside the request — allow for large files
+timeout          = int(os.environ.get('GUNICORN_TIMEOUT', 180))
+graceful_timeout = 30
+keepalive        = 5
+
+# Recycle workers now and then to cap memory growth from pandas
+max_requests        = 1000
+max_requests_jitter = 100
+
+# Import the app once in the master, then fork
+preload_app = True
+
+accesslog = '-'
+errorlog  = '-'
+
+
+def post_fork(server, worker):
+    """Connections opened in the master must not be shared with children."""
+    from app import app
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
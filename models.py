@@ -1,9 +1,61 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import UserMixin
+from sqlalchemy import event
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
-db = SQLAlchemy()
+from utils.money import rupees
+
+
+class RoutingSession(Session):
+    """
+    Sends plain SELECTs to the 'read' bind when one is configured (see
+    config._read_bind); flushes, DML and anything else use the primary.
+    Reads therefore never queue behind an ingest holding the write lock.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing
+                and getattr(clause, 'is_select', False)
+                and 'read' in self._db.engines):
+            return self._db.engines['read']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def configure_engines(busy_timeout_ms):
+    """
+    SQLite tuning for several workers on one file. Writers run in WAL mode
+    and take the write lock up front (BEGIN IMMEDIATE), so concurrent
+    ingests queue on busy_timeout instead of failing with 'database is
+    locked' on a read→write upgrade. Readers are autocommit and never block.
+    Must be called inside an app context, before the engines connect.
+    """
+    for key, engine in db.engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        reader = key == 'read'
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_conn, _record, reader=reader):
+            dbapi_conn.isolation_level = None      # we issue BEGIN ourselves
+            cur = dbapi_conn.cursor()
+            cur.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+            if not reader:
+                # only takes effect on a new file; older ones are switched
+                # by the retention job (utils.retention.vacuum)
+                cur.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                cur.execute('PRAGMA journal_mode = WAL')
+                cur.execute('PRAGMA synchronous = NORMAL')
+            cur.close()
+
+        if not reader:
+            @event.listens_for(engine, 'begin')
+            def _on_begin(conn):
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -17,6 +69,8 @@ class User(UserMixin, db.Model):
     last_login    = db.Column(db.DateTime)
     uploads       = db.relationship('Upload', backref='owner', lazy='dynamic',
                                     cascade='all, delete-orphan')
+    retention     = db.relationship('RetentionPolicy', backref='user', uselist=False,
+                                    cascade='all, delete-orphan')
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -35,7 +89,7 @@ class Upload(db.Model):
     original_name   = db.Column(db.String(255), nullable=False)
     stored_name     = db.Column(db.String(255), nullable=False)
     record_count    = db.Column(db.Integer, default=0)
-    total_amount    = db.Column(db.Float, default=0.0)
+    total_amount_paise= db.Column(db.BigInteger, default=0)     # paise, see utils/money.py
     unique_customers= db.Column(db.Integer, default=0)
     unique_products = db.Column(db.Integer, default=0)
     unique_invoices = db.Column(db.Integer, default=0)
@@ -43,15 +97,53 @@ class Upload(db.Model):
     date_to         = db.Column(db.String(20))
     uploaded_at     = db.Column(db.DateTime, default=datetime.utcnow)
     is_active       = db.Column(db.Boolean, default=True)
+    deactivated_at  = db.Column(db.DateTime)
+    # rows moved out of sales_records into a compressed columnar archive
+    # (utils/retention.py); restored on the next switch to this upload
+    rows_archived   = db.Column(db.Boolean, default=False, nullable=False,
+                                server_default=db.false())
+    # last restore of those rows; retention counts idle days from the
+    # later of this and deactivated_at
+    last_used_at    = db.Column(db.DateTime)
     records         = db.relationship('SalesRecord', backref='upload', lazy='dynamic',
                                       cascade='all, delete-orphan')
+    sketches        = db.relationship('UploadSketch', backref='upload', lazy='dynamic',
+                                      cascade='all, delete-orphan')
+    samples         = db.relationship('SalesSample', backref='upload', lazy='dynamic',
+                                      cascade='all, delete-orphan')
+    payloads        = db.relationship('DashboardPayload', backref='upload', lazy='dynamic',
+                                      cascade='all, delete-orphan')
 
     def __repr__(self):
         return f'<Upload {self.original_name}>'
 
 
+class RetentionPolicy(db.Model):
+    """
+    Per-user retention for inactive uploads, in days since an upload was
+    last active. NULL falls back to the RETENTION_* config default; 0
+    turns the step off.
+    """
+    __tablename__ = 'retention_policies'
+    id                  = db.Column(db.Integer, primary_key=True)
+    user_id             = db.Column(db.Integer, db.ForeignKey('users.id'),
+                                    nullable=False, unique=True)
+    compress_raw_days   = db.Column(db.Integer)     # gzip the raw upload file
+    delete_raw_days     = db.Column(db.Integer)     # remove the raw upload file
+    archive_rows_days   = db.Column(db.Integer)     # move rows to a columnar archive
+    updated_at          = db.Column(db.DateTime, default=datetime.utcnow,
+                                    onupdate=datetime.utcnow)
+
+
 class SalesRecord(db.Model):
     __tablename__ = 'sales_records'
+    # Every API query is scoped by upload_id (often several via IN (...)),
+    # so the hot filters are indexed with upload_id as the leading column.
+    __table_args__ = (
+        db.Index('ix_sales_upload_date', 'upload_id', 'sale_date'),
+        db.Index('ix_sales_upload_category', 'upload_id', 'category'),
+        db.Index('ix_sales_upload_invoice', 'upload_id', 'invoice_no', 'party_name'),
+    )
     id            = db.Column(db.Integer, primary_key=True)
     upload_id     = db.Column(db.Integer, db.ForeignKey('uploads.id'), nullable=False)
     sale_date     = db.Column(db.Date, index=True)
@@ -62,8 +154,9 @@ class SalesRecord(db.Model):
     category      = db.Column(db.String(100), index=True)
     quantity      = db.Column(db.Float, default=0)
     unit          = db.Column(db.String(20))
-    price_per_unit= db.Column(db.Float, default=0)
-    amount        = db.Column(db.Float, default=0, index=True)
+    # money is integer paise (utils/money.py)
+    price_per_unit_paise= db.Column(db.BigInteger, default=0)
+    amount_paise  = db.Column(db.BigInteger, default=0, index=True)
 
     def to_dict(self):
         return {
@@ -75,5 +168,50 @@ class SalesRecord(db.Model):
             'category':     self.category,
             'quantity':     self.quantity,
             'unit':         self.unit,
-            'amount':       round(self.amount, 2)
+            'amount':       rupees(self.amount_paise)
         }
+
+
+class UploadSketch(db.Model):
+    """HyperLogLog registers (zlib-packed) per (month, category) stratum of a large upload."""
+    __tablename__ = 'upload_sketches'
+    id            = db.Column(db.Integer, primary_key=True)
+    upload_id     = db.Column(db.Integer, db.ForeignKey('uploads.id'), nullable=False, index=True)
+    month_key     = db.Column(db.String(7))
+    category      = db.Column(db.String(100))
+    row_count     = db.Column(db.Integer, default=0)
+    customers     = db.Column(db.LargeBinary)
+    products      = db.Column(db.LargeBinary)
+    invoices      = db.Column(db.LargeBinary)
+
+
+class SalesSample(db.Model):
+    """
+    Stratified (month × category) random sample of a large upload's rows.
+    stratum_rows / stratum_sample are N_h / n_h, i.e. each row stands for
+    stratum_rows / stratum_sample rows of the full upload.
+    """
+    __tablename__ = 'sales_samples'
+    id            = db.Column(db.Integer, primary_key=True)
+    upload_id     = db.Column(db.Integer, db.ForeignKey('uploads.id'), nullable=False, index=True)
+    sale_date     = db.Column(db.Date)
+    month_key     = db.Column(db.String(7))
+    party_name    = db.Column(db.String(255))
+    invoice_no    = db.Column(db.String(50))
+    product       = db.Column(db.String(500))
+    category      = db.Column(db.String(100))
+    quantity      = db.Column(db.Float, default=0)
+    amount_paise  = db.Column(db.BigInteger, default=0)
+    stratum_rows  = db.Column(db.Integer, default=1)
+    stratum_sample= db.Column(db.Integer, default=1)
+
+
+class DashboardPayload(db.Model):
+    """Precomputed JSON of an unfiltered dashboard API call for one upload."""
+    __tablename__ = 'dashboard_payloads'
+    __table_args__ = (db.UniqueConstraint('upload_id', 'key'),)
+    id            = db.Column(db.Integer, primary_key=True)
+    upload_id     = db.Column(db.Integer, db.ForeignKey('uploads.id'), nullable=False)
+    key           = db.Column(db.String(100), nullable=False)   # e.g. 'v1:api.top_products?limit=12'
+    payload       = db.Column(db.Text, nullable=False)
+    created_at    = db.Column(db.DateTime, default=datetime.utcnow)
@@ -1,19 +1,91 @@
-from flask import Blueprint, jsonify, request
+import os
+import re
+import json
+import threading
+from datetime import date
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, jsonify, request, abort, current_app, url_for
 from flask_login import login_required, current_user
-from sqlalchemy import func
+from sqlalchemy import func, select, tuple_, case, cast
+from sqlalchemy.exc import IntegrityError
 
-from models import db, Upload, SalesRecord
+from models import (db, Upload, SalesRecord, UploadSketch, SalesSample, DashboardPayload,
+                    RetentionPolicy)
+from utils import cache, context, retention
+from utils.money import rupees
+from utils.singleflight import SingleFlight
 
 api_bp = Blueprint('api', __name__)
 
 
 def _get_active_upload():
-    return Upload.query.filter_by(user_id=current_user.id, is_active=True).first()
+    return context.cached_row('active_upload', current_user.id, lambda: (
+        Upload.query.filter_by(user_id=current_user.id, is_active=True).first()))
+
+
+def _get_scope():
+    """
+    Uploads an API call reads from.
+
+    ?uploads=3,7,9 selects several of the current user's uploads so that
+    every aggregate is served over their union; without it the active
+    upload is used, as before.
+    """
+    warm = request.environ.get('kaadu.warm_upload')
+    if warm is not None:
+        return [warm]
+    raw = request.args.get('uploads', '').strip()
+    if not raw:
+        upload = _get_active_upload()
+        return [upload] if upload else []
+    try:
+        ids = {int(x) for x in raw.split(',') if x.strip()}
+    except ValueError:
+        abort(400, description="'uploads' must be a comma-separated list of upload ids")
+    scope = (Upload.query
+             .filter(Upload.user_id == current_user.id, Upload.id.in_(ids))
+             .order_by(Upload.id).all())
+    # restoring is a bulk write, so reads never do it: the client restores
+    # archived uploads first (POST /api/uploads/<id>/restore)
+    archived = [u.id for u in scope if u.rows_archived]
+    if archived:
+        abort(409, description=f'uploads {archived} are archived — '
+                               f'POST /api/uploads/<id>/restore or switch to them first')
+    return scope
+
+
+def _scope_filter(q, scope):
+    """
+    Restrict q to the uploads in scope.
+
+    With ?dedupe=latest an invoice (invoice_no + party) that appears in
+    several of the selected uploads — e.g. overlapping exports — is only
+    counted from the most recent upload containing it. Rows without an
+    invoice number are always kept.
+    """
+    ids = [u.id for u in scope]
+    if len(ids) == 1:
+        return q.filter(SalesRecord.upload_id == ids[0])
+
+    q = q.filter(SalesRecord.upload_id.in_(ids))
+    if request.args.get('dedupe') == 'latest':
+        latest = (select(SalesRecord.invoice_no, SalesRecord.party_name,
+                         func.max(SalesRecord.upload_id))
+                  .where(SalesRecord.upload_id.in_(ids), SalesRecord.invoice_no != '')
+                  .group_by(SalesRecord.invoice_no, SalesRecord.party_name))
+        q = q.filter(db.or_(
+            SalesRecord.invoice_no == '',
+            tuple_(SalesRecord.invoice_no, SalesRecord.party_name,
+                   SalesRecord.upload_id).in_(latest),
+        ))
+    return q
 
 
-def _apply_filters(q, upload_id):
+def _apply_filters(q, scope):
     """Apply category, product, date_from, date_to from request args."""
-    q = q.filter(SalesRecord.upload_id == upload_id)
+    q = _scope_filter(q, scope)
 
     cat = request.args.get('category', 'all')
     if cat and cat != 'all':
@@ -33,78 +105,421 @@ def _apply_filters(q, upload_id):
     return q
 
 
+def _filter_args():
+    """The filters _apply_filters reads, as keyword arguments."""
+    return {
+        'category':  request.args.get('category', 'all'),
+        'product':   request.args.get('product', 'all'),
+        'date_from': request.args.get('date_from', '').strip(),
+        'date_to':   request.args.get('date_to',   '').strip(),
+    }
+
+
+def _paise_sum(expr=SalesRecord.amount_paise):
+    """SUM of integer paise; Postgres widens SUM(bigint) to numeric, so cast it back."""
+    return cast(func.sum(expr), db.BigInteger)
+
+
+# ─────────────────────────────────────────────────
+# Request coalescing
+# The dashboard fires identical calls at the same moment (categories from
+# two charts, stats from two tabs, top-products at two limits) and users
+# share uploads. Within a worker, concurrent calls with the same endpoint,
+# upload scope and normalized filters run once and share the response.
+# Top-N views compute at least TOPN_FETCH rows and each caller gets its own
+# slice, so calls that differ only in a `limit` up to TOPN_FETCH share one
+# result too; larger limits are keyed by their own fetch size.
+# ─────────────────────────────────────────────────
+TOPN_FETCH = 100
+_flights   = SingleFlight()
+
+
+def _limit(default):
+    """Rows a top-N view should compute — at least TOPN_FETCH under @coalesced(topn=...)."""
+    return request.environ.get('kaadu.fetch_limit') or int(request.args.get('limit', default))
+
+
+def _coalesce_key(scope, topn):
+    args = tuple(sorted(
+        (k, v.strip()) for k, v in request.args.items(multi=True)
+        if v.strip() and not (k in ('category', 'product') and v.strip() == 'all')
+        and not (topn and k == 'limit')
+    ))
+    fetch = request.environ.get('kaadu.fetch_limit', 0)
+    if fetch > TOPN_FETCH:
+        args += (('fetch', fetch),)
+    return request.endpoint, tuple(u.id for u in scope), args
+
+
+def coalesced(view=None, topn=None):
+    """
+    Share one execution between identical concurrent calls. For top-N
+    views pass topn=<the view's default limit>.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if topn:
+                limit = int(request.args.get('limit', topn))
+                request.environ['kaadu.fetch_limit'] = max(limit, TOPN_FETCH)
+            key = _coalesce_key(_get_scope(), topn)
+
+            def run():
+                resp = current_app.make_response(view(*args, **kwargs))
+                return resp.status_code, resp.get_data(), resp.mimetype
+
+            status, data, mimetype = _flights.do(key, run)
+            if topn and status == 200:
+                rows = json.loads(data)
+                if isinstance(rows, list):
+                    return jsonify(rows[:limit])
+            return current_app.response_class(data, status=status, mimetype=mimetype)
+        return wrapper
+    return decorator(view) if view else decorator
+
+
+# ─────────────────────────────────────────────────
+# Precomputed dashboard payloads
+# The unfiltered calls the dashboard makes on first load are stored per
+# upload (DashboardPayload) and replayed from there. Only warm_dashboard()
+# writes them, on a background thread queued after ingest / switch or on
+# the first miss, so a dashboard read never waits for the write lock.
+# Bump PAYLOAD_VERSION whenever a stored response changes shape.
+# ─────────────────────────────────────────────────
+PAYLOAD_VERSION = 1
+_PLAIN_ARGS  = {'category', 'product', 'date_from', 'date_to', 'limit'}
+_warm_pool    = ThreadPoolExecutor(max_workers=1, thread_name_prefix='warm-dashboard')
+_warm_pending = set()
+_warm_lock    = threading.Lock()
+
+DASHBOARD_REQUESTS = [
+    ('stats', None), ('monthly', None), ('categories', None),
+    ('top_products', 12), ('top_customers', 10),
+    ('product_breakdown', 8), ('product_trend', None),
+    ('date_bounds', None), ('category_list', None),
+]
+
+
+def _payload_key():
+    """Stored-payload key for this request, or None if it is filtered."""
+    args = request.args
+    if set(args) - _PLAIN_ARGS:
+        return None
+    if any(args.get(a, 'all') not in ('', 'all') for a in ('category', 'product')):
+        return None
+    if any(args.get(a, '').strip() for a in ('date_from', 'date_to')):
+        return None
+    key = f'v{PAYLOAD_VERSION}:{request.endpoint}'
+    if 'limit' in args or 'kaadu.fetch_limit' in request.environ:
+        key += f'?limit={_limit(0)}'
+    return key
+
+
+def precomputed(view):
+    """Serve unfiltered single-upload calls from DashboardPayload."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key   = _payload_key()
+        scope = _get_scope() if key else []
+        if len(scope) != 1:
+            return view(*args, **kwargs)
+
+        hit = DashboardPayload.query.filter_by(upload_id=scope[0].id, key=key).first()
+        if hit:
+            return current_app.response_class(hit.payload, mimetype='application/json')
+
+        resp = current_app.make_response(view(*args, **kwargs))
+        if resp.status_code != 200:
+            return resp
+        if request.environ.get('kaadu.warm_upload') is None:
+            warm_in_background(scope[0].id)
+            return resp
+        try:
+            db.session.add(DashboardPayload(upload_id=scope[0].id, key=key,
+                                            payload=resp.get_data(as_text=True)))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()           # stored meanwhile (another worker)
+        return resp
+
+    return wrapper
+
+
+def warm_dashboard(upload):
+    """Compute and store the unfiltered dashboard payloads of `upload`."""
+    stored = {k for (k,) in upload.payloads.with_entities(DashboardPayload.key)}
+    for name, limit in DASHBOARD_REQUESTS:
+        query = {'limit': limit} if limit else {}
+        with current_app.test_request_context(
+                url_for(f'api.{name}'), query_string=query,
+                environ_overrides={'kaadu.warm_upload': upload}):
+            if _payload_key() not in stored:
+                # skip login_required: the scope comes from the environ
+                current_app.view_functions[f'api.{name}'].__wrapped__()
+
+
+def warm_in_background(upload_id):
+    """Queue warm_dashboard() for `upload_id` unless it is already queued."""
+    with _warm_lock:
+        if upload_id in _warm_pending:
+            return
+        _warm_pending.add(upload_id)
+    _warm_pool.submit(_warm_job, current_app._get_current_object(), upload_id)
+
+
+def _warm_job(app, upload_id):
+    try:
+        with app.test_request_context():        # url_for needs a request
+            upload = db.session.get(Upload, upload_id)
+            if upload is not None:
+                warm_dashboard(upload)
+    except Exception:
+        app.logger.exception('Dashboard warm-up failed for upload %s', upload_id)
+    finally:
+        with _warm_lock:
+            _warm_pending.discard(upload_id)
+
+
+# ─────────────────────────────────────────────────
+# Approximate mode (?approx=1) — see utils/approx.py
+# ─────────────────────────────────────────────────
+def _approx_source(scope):
+    """
+    Sample + sketches behind ?approx=1, or None when the exact path must
+    answer: approx not requested, an upload in scope was too small to get
+    synopses at ingest, or a filter they cannot serve (a single product,
+    dedupe across uploads).
+    """
+    if request.args.get('approx') != '1':
+        return None
+    if request.args.get('product', 'all') not in ('', 'all') or request.args.get('dedupe'):
+        return None
+    # keyed by stored_name like the other analytics: ids are reused after a delete
+    return cache.cached(_analytics_key('approx', scope), lambda: _load_approx(scope))
+
+
+def _load_approx(scope):
+    import pandas as pd
+    from utils.approx import ApproxSource, SKETCH_FIELDS
+    ids = [u.id for u in scope]
+    have = {r[0] for r in (UploadSketch.query
+                           .filter(UploadSketch.upload_id.in_(ids))
+                           .with_entities(UploadSketch.upload_id).distinct())}
+    if have != set(ids):
+        return None
+
+    def frame(model, cols):
+        rows = model.query.filter(model.upload_id.in_(ids)).with_entities(*cols).all()
+        return pd.DataFrame(rows, columns=[c.key for c in cols])
+
+    sample = frame(SalesSample, [
+        SalesSample.upload_id, SalesSample.sale_date, SalesSample.month_key,
+        SalesSample.party_name, SalesSample.product, SalesSample.category,
+        SalesSample.quantity, SalesSample.amount_paise,
+        SalesSample.stratum_rows, SalesSample.stratum_sample])
+    sketches = frame(UploadSketch, [UploadSketch.month_key, UploadSketch.category] +
+                     [getattr(UploadSketch, name) for name in SKETCH_FIELDS])
+    return ApproxSource(sample, sketches)
+
+
+def _approx_group(src, mask, by):
+    """Per-`by` amount and row-count estimates (with errors) and quantity, largest first."""
+    amt  = src.totals(mask, by=by)
+    rows = src.totals(mask, by=by, value=None).rename(columns={'est': 'rows', 'err': 'rows_err'})
+    out  = amt.join(src.totals(mask, by=by, value='quantity')['est'].rename('qty')).join(rows)
+    return out.sort_values('est', ascending=False)
+
+
+def _approx_stats(src, scope):
+    import numpy as np
+    cat       = request.args.get('category', 'all')
+    date_from = request.args.get('date_from', '').strip()
+    date_to   = request.args.get('date_to',   '').strip()
+    mask  = src.mask(cat, date_from, date_to)
+    total = src.totals(mask).iloc[0]
+    recs  = src.totals(mask, value=None).iloc[0]
+    cust, cust_err = src.distinct('customers', cat, date_from, date_to)
+    prod, prod_err = src.distinct('products',  cat, date_from, date_to)
+    inv,  inv_err  = src.distinct('invoices',  cat, date_from, date_to)
+    dates = src.sample.loc[mask, 'sale_date'].dropna()
+    avg   = total.est / max(inv, 1)
+    avg_err = avg * np.hypot(total.err / total.est if total.est else 0,
+                             inv_err / inv if inv else 0)
+    return jsonify({
+        'total_amount':     rupees(total.est),
+        'record_count':     round(recs.est),
+        'unique_customers': cust,
+        'unique_products':  prod,
+        'unique_invoices':  inv,
+        'date_from':        dates.min().strftime('%d-%m-%Y') if len(dates) else 'N/A',
+        'date_to':          dates.max().strftime('%d-%m-%Y') if len(dates) else 'N/A',
+        'avg_invoice':      rupees(avg),
+        'filename':         ' + '.join(u.original_name for u in scope),
+        'approx':           True,
+        'confidence':       0.95,
+        'error': {
+            'total_amount':     rupees(total.err),
+            'record_count':     round(recs.err),
+            'unique_customers': cust_err,
+            'unique_products':  prod_err,
+            'unique_invoices':  inv_err,
+            'avg_invoice':      rupees(avg_err),
+        },
+    })
+
+
+# ─────────────────────────────────────────────────
+# Columnar backend — see utils/columnar.py
+# Aggregates read the memory-mapped Arrow file of each upload instead of
+# scanning sales_records; SQL stays the fallback.
+# ─────────────────────────────────────────────────
+def _columnar_source(scope):
+    """
+    ColumnarSource over the scope, or None when SQL must answer: backend
+    not enabled, an upload has no columnar file yet (ingested before the
+    store existed — `flask --app app backfill-columnar`), ?dedupe=, or
+    dates that are not ISO (SQL compares those as text).
+    """
+    if current_app.config['ANALYTICS_BACKEND'] != 'columnar' or request.args.get('dedupe'):
+        return None
+    try:
+        for arg in ('date_from', 'date_to'):
+            if request.args.get(arg, '').strip():
+                date.fromisoformat(request.args[arg].strip())
+    except ValueError:
+        return None
+
+    from utils.columnar import ColumnarSource, columnar_path, open_columnar
+    folder = current_app.config['UPLOAD_FOLDER']
+    paths  = [columnar_path(folder, u.stored_name) for u in scope]
+    if not all(os.path.exists(p) for p in paths):
+        return None
+    # one mapping per upload and worker, dropped with the upload; keyed by
+    # stored_name because another upload can get a deleted one's id
+    return ColumnarSource.combine([
+        cache.cached(('columnar', (u.stored_name,), ''), lambda p=p: open_columnar(p))
+        for u, p in zip(scope, paths)])
+
+
 @api_bp.route('/stats')
 @login_required
+@coalesced
+@precomputed
 def stats():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify({'error': 'No active upload'}), 404
+    src = _approx_source(scope)
+    if src:
+        return _approx_stats(src, scope)
 
-    q = _apply_filters(SalesRecord.query, upload.id)
-    row = q.with_entities(
-        func.sum(SalesRecord.amount),
-        func.count(SalesRecord.id),
-        func.count(func.distinct(SalesRecord.party_name)),
-        func.count(func.distinct(SalesRecord.product)),
-        func.count(func.distinct(SalesRecord.invoice_no)),
-        func.min(SalesRecord.sale_date),
-        func.max(SalesRecord.sale_date),
-    ).one()
+    col = _columnar_source(scope)
+    if col:
+        row = col.where(**_filter_args()).aggregate(
+            total=('amount_paise', 'sum'), rec=('amount_paise', 'count'),
+            cust=('party_name', 'count_distinct'), prod=('product', 'count_distinct'),
+            inv=('invoice_no', 'count_distinct'),
+            dmin=('sale_date', 'min'), dmax=('sale_date', 'max'))
+    else:
+        q = _apply_filters(SalesRecord.query, scope)
+        row = q.with_entities(
+            _paise_sum(),
+            func.count(SalesRecord.id),
+            func.count(func.distinct(SalesRecord.party_name)),
+            func.count(func.distinct(SalesRecord.product)),
+            func.count(func.distinct(SalesRecord.invoice_no)),
+            func.min(SalesRecord.sale_date),
+            func.max(SalesRecord.sale_date),
+        ).one()
 
     total, rec, cust, prod, inv, dmin, dmax = row
     total = total or 0
     return jsonify({
-        'total_amount':     round(total, 2),
+        'total_amount':     rupees(total),
         'record_count':     rec or 0,
         'unique_customers': cust or 0,
         'unique_products':  prod or 0,
         'unique_invoices':  inv or 0,
         'date_from':        dmin.strftime('%d-%m-%Y') if dmin else 'N/A',
         'date_to':          dmax.strftime('%d-%m-%Y') if dmax else 'N/A',
-        'avg_invoice':      round(total / max(inv or 1, 1), 2),
-        'filename':         upload.original_name,
+        'avg_invoice':      rupees(total / max(inv or 1, 1)),
+        'filename':         ' + '.join(u.original_name for u in scope),
     })
 
 
 @api_bp.route('/monthly')
 @login_required
+@coalesced
+@precomputed
 def monthly():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
-    q = _apply_filters(SalesRecord.query, upload.id)
+    src = _approx_source(scope)
+    if src:
+        s = src.sample
+        mask = (src.mask(request.args.get('category', 'all'),
+                         request.args.get('date_from', '').strip(),
+                         request.args.get('date_to', '').strip())
+                & s['month_key'].notna().to_numpy() & (s['month_key'] != 'Unknown').to_numpy())
+        t = src.totals(mask, by='month_key').sort_index()
+        return jsonify([{'month': m, 'amount': rupees(r.est), 'error': rupees(r.err)}
+                        for m, r in t.iterrows()])
+    col = _columnar_source(scope)
+    if col:
+        rows = col.where(**_filter_args(), months_only=True).group(
+            'month_key', order_by='month_key', descending=False, total=('amount_paise', 'sum'))
+        return jsonify([{'month': r.month_key, 'amount': rupees(r.total)} for r in rows])
+    q = _apply_filters(SalesRecord.query, scope)
     rows = (q.filter(SalesRecord.month_key.isnot(None), SalesRecord.month_key != 'Unknown')
-             .with_entities(SalesRecord.month_key, func.sum(SalesRecord.amount).label('total'))
+             .with_entities(SalesRecord.month_key, _paise_sum().label('total'))
              .group_by(SalesRecord.month_key)
              .order_by(SalesRecord.month_key)
              .all())
-    return jsonify([{'month': r.month_key, 'amount': round(r.total, 2)} for r in rows])
+    return jsonify([{'month': r.month_key, 'amount': rupees(r.total)} for r in rows])
 
 
 @api_bp.route('/categories')
 @login_required
+@coalesced
+@precomputed
 def categories():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
     # categories endpoint ignores 'category' filter but respects date + product
-    q = SalesRecord.query.filter(SalesRecord.upload_id == upload.id)
+    src = _approx_source(scope)
+    if src:
+        mask = src.mask(None, request.args.get('date_from', '').strip(),
+                        request.args.get('date_to', '').strip())
+        t = _approx_group(src, mask, 'category')
+        grand = t['est'].sum() or 1
+        return jsonify([{
+            'category': c, 'amount': rupees(r.est), 'error': rupees(r.err),
+            'count':    round(r.rows), 'pct': round(r.est / grand * 100, 1)
+        } for c, r in t.iterrows()])
     date_from = request.args.get('date_from', '').strip()
     date_to   = request.args.get('date_to',   '').strip()
-    if date_from:
-        q = q.filter(SalesRecord.sale_date >= date_from)
-    if date_to:
-        q = q.filter(SalesRecord.sale_date <= date_to)
-    rows = (q.with_entities(SalesRecord.category,
-                            func.sum(SalesRecord.amount).label('total'),
-                            func.count(SalesRecord.id).label('cnt'))
-             .group_by(SalesRecord.category)
-             .order_by(func.sum(SalesRecord.amount).desc())
-             .all())
+    col = _columnar_source(scope)
+    if col:
+        rows = col.where(date_from=date_from, date_to=date_to).group(
+            'category', order_by='total', total=('amount_paise', 'sum'), cnt=('amount_paise', 'count'))
+    else:
+        q = _scope_filter(SalesRecord.query, scope)
+        if date_from:
+            q = q.filter(SalesRecord.sale_date >= date_from)
+        if date_to:
+            q = q.filter(SalesRecord.sale_date <= date_to)
+        rows = (q.with_entities(SalesRecord.category,
+                                _paise_sum().label('total'),
+                                func.count(SalesRecord.id).label('cnt'))
+                 .group_by(SalesRecord.category)
+                 .order_by(_paise_sum().desc())
+                 .all())
     grand = sum(r.total for r in rows) or 1
     return jsonify([{
         'category': r.category,
-        'amount':   round(r.total, 2),
+        'amount':   rupees(r.total),
         'count':    r.cnt,
         'pct':      round(r.total / grand * 100, 1)
     } for r in rows])
@@ -112,53 +527,105 @@ def categories():
 
 @api_bp.route('/top-products')
 @login_required
+@coalesced(topn=15)
+@precomputed
 def top_products():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
-    limit = int(request.args.get('limit', 15))
-    q = _apply_filters(SalesRecord.query, upload.id)
-    rows = (q.with_entities(
-                SalesRecord.product, SalesRecord.category,
-                func.sum(SalesRecord.amount).label('total'),
-                func.sum(SalesRecord.quantity).label('qty'),
-                func.count(func.distinct(SalesRecord.invoice_no)).label('inv'))
-             .group_by(SalesRecord.product, SalesRecord.category)
-             .order_by(func.sum(SalesRecord.amount).desc())
-             .limit(limit).all())
-    grand_q = SalesRecord.query.filter(SalesRecord.upload_id == upload.id)
+    limit = _limit(15)
+    src = _approx_source(scope)
+    if src:
+        date_from = request.args.get('date_from', '').strip()
+        date_to   = request.args.get('date_to',   '').strip()
+        mask  = src.mask(request.args.get('category', 'all'), date_from, date_to)
+        t     = _approx_group(src, mask, 'product').head(limit)
+        cats  = src.sample[mask].groupby('product')['category'].first()
+        grand = src.totals(src.mask(None, date_from, date_to))['est'].iloc[0] or 1
+        # distinct invoices per product are not sketched: the sample gives
+        # line items instead, under their own name and error bound
+        return jsonify([{
+            'product':  p, 'category': cats.get(p),
+            'amount':   rupees(r.est), 'error': rupees(r.err),
+            'qty':      round(r.qty, 2),
+            'lines':    round(r.rows), 'lines_error': round(r.rows_err),
+            'pct':      round(r.est / grand * 100, 1)
+        } for p, r in t.iterrows()])
     date_from = request.args.get('date_from', '').strip()
     date_to   = request.args.get('date_to',   '').strip()
-    if date_from: grand_q = grand_q.filter(SalesRecord.sale_date >= date_from)
-    if date_to:   grand_q = grand_q.filter(SalesRecord.sale_date <= date_to)
-    grand = grand_q.with_entities(func.sum(SalesRecord.amount)).scalar() or 1
+    col = _columnar_source(scope)
+    if col:
+        rows = col.where(**_filter_args()).group(
+            ['product', 'category'], order_by='total', limit=limit,
+            total=('amount_paise', 'sum'), qty=('quantity', 'sum'),
+            inv=('invoice_no', 'count_distinct'))
+        grand = col.where(date_from=date_from, date_to=date_to)\
+                   .aggregate(total=('amount_paise', 'sum')).total or 1
+    else:
+        q = _apply_filters(SalesRecord.query, scope)
+        rows = (q.with_entities(
+                    SalesRecord.product, SalesRecord.category,
+                    _paise_sum().label('total'),
+                    func.sum(SalesRecord.quantity).label('qty'),
+                    func.count(func.distinct(SalesRecord.invoice_no)).label('inv'))
+                 .group_by(SalesRecord.product, SalesRecord.category)
+                 .order_by(_paise_sum().desc())
+                 .limit(limit).all())
+        grand_q = _scope_filter(SalesRecord.query, scope)
+        if date_from: grand_q = grand_q.filter(SalesRecord.sale_date >= date_from)
+        if date_to:   grand_q = grand_q.filter(SalesRecord.sale_date <= date_to)
+        grand = grand_q.with_entities(_paise_sum()).scalar() or 1
     return jsonify([{
         'product':  r.product, 'category': r.category,
-        'amount':   round(r.total, 2), 'qty': round(r.qty or 0, 2),
+        'amount':   rupees(r.total), 'qty': round(r.qty or 0, 2),
         'invoices': r.inv, 'pct': round(r.total / grand * 100, 1)
     } for r in rows])
 
 
 @api_bp.route('/top-customers')
 @login_required
+@coalesced(topn=10)
+@precomputed
 def top_customers():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
-    limit = int(request.args.get('limit', 10))
-    q = _apply_filters(SalesRecord.query, upload.id)
-    rows = (q.with_entities(
-                SalesRecord.party_name,
-                func.sum(SalesRecord.amount).label('total'),
-                func.count(func.distinct(SalesRecord.invoice_no)).label('inv'),
-                func.count(func.distinct(SalesRecord.product)).label('prods'))
-             .group_by(SalesRecord.party_name)
-             .order_by(func.sum(SalesRecord.amount).desc())
-             .limit(limit).all())
-    grand = _apply_filters(SalesRecord.query, upload.id)\
-                .with_entities(func.sum(SalesRecord.amount)).scalar() or 1
+    limit = _limit(10)
+    src = _approx_source(scope)
+    if src:
+        mask  = src.mask(request.args.get('category', 'all'),
+                         request.args.get('date_from', '').strip(),
+                         request.args.get('date_to', '').strip())
+        t     = _approx_group(src, mask, 'party_name').head(limit)
+        grand = src.totals(mask)['est'].iloc[0] or 1
+        # distinct invoices / products per customer are not sketched: the
+        # sample gives line items instead, under their own name and error bound
+        return jsonify([{
+            'customer': c, 'amount': rupees(r.est), 'error': rupees(r.err),
+            'lines':    round(r.rows), 'lines_error': round(r.rows_err),
+            'pct':      round(r.est / grand * 100, 1)
+        } for c, r in t.iterrows()])
+    col = _columnar_source(scope)
+    if col:
+        view = col.where(**_filter_args())
+        rows = view.group('party_name', order_by='total', limit=limit,
+                          total=('amount_paise', 'sum'), inv=('invoice_no', 'count_distinct'),
+                          prods=('product', 'count_distinct'))
+        grand = view.aggregate(total=('amount_paise', 'sum')).total or 1
+    else:
+        q = _apply_filters(SalesRecord.query, scope)
+        rows = (q.with_entities(
+                    SalesRecord.party_name,
+                    _paise_sum().label('total'),
+                    func.count(func.distinct(SalesRecord.invoice_no)).label('inv'),
+                    func.count(func.distinct(SalesRecord.product)).label('prods'))
+                 .group_by(SalesRecord.party_name)
+                 .order_by(_paise_sum().desc())
+                 .limit(limit).all())
+        grand = _apply_filters(SalesRecord.query, scope)\
+                    .with_entities(_paise_sum()).scalar() or 1
     return jsonify([{
-        'customer': r.party_name, 'amount': round(r.total, 2),
+        'customer': r.party_name, 'amount': rupees(r.total),
         'invoices': r.inv, 'products': r.prods,
         'pct': round(r.total / grand * 100, 1)
     } for r in rows])
@@ -166,32 +633,43 @@ def top_customers():
 
 @api_bp.route('/product-breakdown')
 @login_required
+@coalesced(topn=25)
+@precomputed
 def product_breakdown():
     """All products within a category (or all), filtered by date."""
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
-    limit = int(request.args.get('limit', 25))
-    q = SalesRecord.query.filter(SalesRecord.upload_id == upload.id)
+    limit = _limit(25)
     cat = request.args.get('category', 'all')
     date_from = request.args.get('date_from', '').strip()
     date_to   = request.args.get('date_to',   '').strip()
-    if cat and cat != 'all':
-        q = q.filter(SalesRecord.category == cat)
-    if date_from: q = q.filter(SalesRecord.sale_date >= date_from)
-    if date_to:   q = q.filter(SalesRecord.sale_date <= date_to)
-    rows = (q.with_entities(
-                SalesRecord.product,
-                func.sum(SalesRecord.amount).label('total'),
-                func.sum(SalesRecord.quantity).label('qty'),
-                func.count(func.distinct(SalesRecord.invoice_no)).label('inv'),
-                func.count(func.distinct(SalesRecord.party_name)).label('custs'))
-             .group_by(SalesRecord.product)
-             .order_by(func.sum(SalesRecord.amount).desc())
-             .limit(limit).all())
-    grand = q.with_entities(func.sum(SalesRecord.amount)).scalar() or 1
+    col = _columnar_source(scope)
+    if col:
+        view = col.where(category=cat, date_from=date_from, date_to=date_to)
+        rows = view.group('product', order_by='total', limit=limit,
+                          total=('amount_paise', 'sum'), qty=('quantity', 'sum'),
+                          inv=('invoice_no', 'count_distinct'),
+                          custs=('party_name', 'count_distinct'))
+        grand = view.aggregate(total=('amount_paise', 'sum')).total or 1
+    else:
+        q = _scope_filter(SalesRecord.query, scope)
+        if cat and cat != 'all':
+            q = q.filter(SalesRecord.category == cat)
+        if date_from: q = q.filter(SalesRecord.sale_date >= date_from)
+        if date_to:   q = q.filter(SalesRecord.sale_date <= date_to)
+        rows = (q.with_entities(
+                    SalesRecord.product,
+                    _paise_sum().label('total'),
+                    func.sum(SalesRecord.quantity).label('qty'),
+                    func.count(func.distinct(SalesRecord.invoice_no)).label('inv'),
+                    func.count(func.distinct(SalesRecord.party_name)).label('custs'))
+                 .group_by(SalesRecord.product)
+                 .order_by(_paise_sum().desc())
+                 .limit(limit).all())
+        grand = q.with_entities(_paise_sum()).scalar() or 1
     return jsonify([{
-        'product':   r.product, 'amount': round(r.total, 2),
+        'product':   r.product, 'amount': rupees(r.total),
         'qty':       round(r.qty or 0, 1), 'invoices': r.inv,
         'customers': r.custs, 'pct': round(r.total / grand * 100, 1)
     } for r in rows])
@@ -199,49 +677,339 @@ def product_breakdown():
 
 @api_bp.route('/product-trend')
 @login_required
+@coalesced
+@precomputed
 def product_trend():
     """Monthly trend filtered by category + product + date."""
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
-    q = _apply_filters(SalesRecord.query, upload.id)
-    rows = (q.filter(SalesRecord.month_key.isnot(None), SalesRecord.month_key != 'Unknown')
-             .with_entities(
-                SalesRecord.month_key,
-                func.sum(SalesRecord.amount).label('total'),
-                func.sum(SalesRecord.quantity).label('qty'))
-             .group_by(SalesRecord.month_key)
-             .order_by(SalesRecord.month_key)
-             .all())
+    col = _columnar_source(scope)
+    if col:
+        rows = col.where(**_filter_args(), months_only=True).group(
+            'month_key', order_by='month_key', descending=False,
+            total=('amount_paise', 'sum'), qty=('quantity', 'sum'))
+    else:
+        q = _apply_filters(SalesRecord.query, scope)
+        rows = (q.filter(SalesRecord.month_key.isnot(None), SalesRecord.month_key != 'Unknown')
+                 .with_entities(
+                    SalesRecord.month_key,
+                    _paise_sum().label('total'),
+                    func.sum(SalesRecord.quantity).label('qty'))
+                 .group_by(SalesRecord.month_key)
+                 .order_by(SalesRecord.month_key)
+                 .all())
     return jsonify([{
         'month': r.month_key,
-        'amount': round(r.total, 2),
+        'amount': rupees(r.total),
         'qty':    round(r.qty or 0, 1)
     } for r in rows])
 
 
+_COMPARE_GROUPS = {
+    'category': SalesRecord.category,
+    'product':  SalesRecord.product,
+    'customer': SalesRecord.party_name,
+}
+_COMPARE_PERIODS = {'mom': 1, 'yoy': 12}
+_MONTH_KEY       = re.compile(r'\d{4}-(0[1-9]|1[0-2])')
+
+
+def _shift_month(month_key, months):
+    """'2025-03' shifted back by `months` → e.g. '2025-02' / '2024-03'."""
+    y, m = (int(p) for p in month_key.split('-'))
+    idx = y * 12 + (m - 1) - months
+    return f'{idx // 12}-{idx % 12 + 1:02d}'
+
+
+@api_bp.route('/compare')
+@login_required
+@coalesced
+def compare():
+    """
+    Period-over-period movers per category / product / customer.
+
+    ?group=category|product|customer  ?period=mom|yoy  ?month=YYYY-MM
+    (defaults to the latest month in the filtered data). Current and prior
+    totals come from one grouped pass with conditional sums; the grand
+    totals ride along as window aggregates so LIMIT does not hide them.
+    """
+    scope = _get_scope()
+    if not scope:
+        return jsonify({'error': 'No active upload'}), 404
+    group  = request.args.get('group', 'category')
+    period = request.args.get('period', 'mom')
+    if group not in _COMPARE_GROUPS or period not in _COMPARE_PERIODS:
+        abort(400, description="group must be category|product|customer and period mom|yoy")
+    limit = int(request.args.get('limit', 20))
+    current = request.args.get('month', '').strip()
+    if current and not _MONTH_KEY.fullmatch(current):
+        abort(400, description="month must be YYYY-MM")
+
+    q = _apply_filters(SalesRecord.query, scope)\
+            .filter(SalesRecord.month_key.isnot(None), SalesRecord.month_key != 'Unknown')
+    current = current or q.with_entities(func.max(SalesRecord.month_key)).scalar()
+    if not current:
+        return jsonify({'group': group, 'period': period, 'rows': []})
+    prior = _shift_month(current, _COMPARE_PERIODS[period])
+
+    col   = _COMPARE_GROUPS[group]
+    cur   = _paise_sum(case((SalesRecord.month_key == current, SalesRecord.amount_paise), else_=0))
+    prev  = _paise_sum(case((SalesRecord.month_key == prior,   SalesRecord.amount_paise), else_=0))
+    delta = cur - prev
+    rows = (q.filter(SalesRecord.month_key.in_([current, prior]))
+             .with_entities(col.label('key'), cur.label('cur'), prev.label('prev'),
+                            cast(func.sum(cur).over(), db.BigInteger).label('cur_total'),
+                            cast(func.sum(prev).over(), db.BigInteger).label('prev_total'))
+             .group_by(col)
+             .order_by(func.abs(delta).desc(), col)
+             .limit(limit).all())
+
+    def _pct(c, p):
+        return round((c - p) / p * 100, 1) if p else None
+
+    cur_total  = rows[0].cur_total  if rows else 0
+    prev_total = rows[0].prev_total if rows else 0
+    return jsonify({
+        'group':   group,
+        'period':  period,
+        'current': current,
+        'prior':   prior,
+        'totals': {
+            'current': rupees(cur_total), 'prior': rupees(prev_total),
+            'delta':   rupees(cur_total - prev_total),
+            'pct':     _pct(cur_total, prev_total),
+        },
+        'rows': [{
+            'key':     r.key,
+            'current': rupees(r.cur), 'prior': rupees(r.prev),
+            'delta':   rupees(r.cur - r.prev),
+            'pct':     _pct(r.cur, r.prev),
+        } for r in rows],
+    })
+
+
+@api_bp.route('/timeseries')
+@login_required
+@coalesced
+def timeseries():
+    """
+    Amount and quantity per day / week / month / quarter, with empty
+    buckets as zeros.
+
+    ?bucket=day|week|month|quarter (default month; weeks start on Monday)
+    ?series=category|product|customer splits the totals into one series
+    per value — the top `limit` (default 8, at most 50) by amount — in the
+    same response. Buckets run from date_from / date_to, or else the first
+    / last sale in the filtered data.
+    """
+    from utils.timeseries import BUCKETS, MAX_BUCKETS, bucket_count, fill
+    import numpy as np
+
+    bucket = request.args.get('bucket', 'month')
+    series = request.args.get('series', '').strip() or None
+    if bucket not in BUCKETS or (series and series not in _COMPARE_GROUPS):
+        abort(400, description="bucket must be day|week|month|quarter and series category|product|customer")
+    limit = min(int(request.args.get('limit', 8)), 50)
+    scope = _get_scope()
+    if not scope:
+        return jsonify({'bucket': bucket, 'series_by': series, 'buckets': [], 'series': []})
+
+    # per-day (and per-series) sums; bucketing and gap filling are done on these
+    key = _COMPARE_GROUPS[series] if series else None
+    col = _columnar_source(scope)
+    if col:
+        t = col.where(**_filter_args()).grouped(
+            ['sale_date'] + ([key.key] if key is not None else []),
+            total=('amount_paise', 'sum'), qty=('quantity', 'sum'))
+        days   = t['sale_date'].to_numpy(zero_copy_only=False)
+        keys   = (t[key.key].fill_null('Unknown').to_numpy(zero_copy_only=False)
+                  if key is not None else None)
+        totals = t['total'].fill_null(0).to_numpy()
+        qty    = t['qty'].fill_null(0).to_numpy()
+    else:
+        q = _apply_filters(SalesRecord.query, scope).filter(SalesRecord.sale_date.isnot(None))
+        group = [SalesRecord.sale_date] + ([key] if key is not None else [])
+        rows = (q.with_entities(*group, _paise_sum().label('total'),
+                                func.sum(SalesRecord.quantity).label('qty'))
+                 .group_by(*group).all())
+        days   = np.array([r.sale_date for r in rows], dtype='datetime64[D]')
+        keys   = np.array([r[1] or 'Unknown' for r in rows], dtype=object) if key is not None else None
+        totals = np.array([r.total or 0 for r in rows], dtype=np.int64)
+        qty    = np.array([r.qty or 0 for r in rows], dtype=np.float64)
+
+    dated = days[~np.isnat(days)]
+    try:
+        first = np.datetime64(request.args.get('date_from', '').strip()
+                              or (dated.min() if len(dated) else None), 'D')
+        last  = np.datetime64(request.args.get('date_to', '').strip()
+                              or (dated.max() if len(dated) else None), 'D')
+    except ValueError:
+        abort(400, description="date_from / date_to must be YYYY-MM-DD")
+    if np.isnat(first) or np.isnat(last) or first > last:
+        return jsonify({'bucket': bucket, 'series_by': series, 'buckets': [], 'series': []})
+    if bucket_count(first, last, bucket) > MAX_BUCKETS:
+        abort(400, description=f'more than {MAX_BUCKETS} buckets — pick a coarser bucket or a shorter range')
+
+    starts, names, grids = fill(days, keys, {'total': totals, 'qty': qty},
+                                bucket, first, last, limit=limit if key is not None else None)
+    return jsonify({
+        'bucket':    bucket,
+        'series_by': series,
+        'buckets':   [str(d) for d in starts],
+        'series': [{
+            'name':   name if key is not None else 'All',
+            'total':  rupees(int(total_row.sum())),
+            'amount': [rupees(int(p)) for p in total_row],
+            'qty':    [round(float(v), 1) for v in qty_row],
+        } for name, total_row, qty_row in zip(names, grids['total'], grids['qty'])],
+    })
+
+
+def _scope_frame(scope, *cols):
+    """The given SalesRecord columns for every row in scope, as a DataFrame."""
+    import pandas as pd
+    rows = _scope_filter(SalesRecord.query, scope).with_entities(*cols).all()
+    return pd.DataFrame(rows, columns=[c.key for c in cols])
+
+
+def _customer_frame(scope):
+    """party / invoice / date / amount_paise for every row in scope."""
+    import pandas as pd
+    df = _scope_frame(scope, SalesRecord.party_name, SalesRecord.invoice_no,
+                      SalesRecord.sale_date, SalesRecord.amount_paise)
+    df['sale_date'] = pd.to_datetime(df['sale_date'])
+    df['amount_paise'] = df['amount_paise'].astype('int64')
+    return df
+
+
+def _analytics_key(kind, scope):
+    return (kind, tuple(u.stored_name for u in scope), request.args.get('dedupe', ''))
+
+
+@api_bp.route('/rfm')
+@login_required
+@coalesced
+def rfm():
+    """
+    RFM scores for every customer of the upload(s). Whole-upload result,
+    cached per upload; ?segment= and ?limit= only slice the response.
+    """
+    scope = _get_scope()
+    if not scope:
+        return jsonify({'segments': [], 'customers': []})
+    from utils import analytics
+    table = cache.cached(_analytics_key('rfm', scope),
+                             lambda: analytics.compute_rfm(_customer_frame(scope)))
+
+    seg = (table.groupby('segment')
+                .agg(customers=('customer', 'size'), amount=('monetary', 'sum'))
+                .reindex(analytics.RFM_SEGMENTS).dropna().reset_index())
+    rows = table
+    segment = request.args.get('segment', 'all')
+    if segment and segment != 'all':
+        rows = rows[rows['segment'] == segment]
+    limit = int(request.args.get('limit', 100))
+    rows = rows.head(limit)
+
+    return jsonify({
+        'total_customers': len(table),
+        'segments': [{
+            'segment': r.segment, 'customers': int(r.customers),
+            'amount':  rupees(r.amount),
+        } for r in seg.itertuples()],
+        'customers': [{
+            'customer':  r.customer, 'recency': int(r.recency),
+            'frequency': int(r.frequency), 'monetary': rupees(r.monetary),
+            'r': int(r.r), 'f': int(r.f), 'm': int(r.m),
+            'score': int(r.score), 'segment': r.segment,
+        } for r in rows.itertuples()],
+    })
+
+
+@api_bp.route('/cohorts')
+@login_required
+@coalesced
+def cohorts():
+    """Monthly acquisition-cohort retention matrix, cached per upload."""
+    scope = _get_scope()
+    if not scope:
+        return jsonify({'cohorts': [], 'max_age': 0})
+    from utils import analytics
+    return jsonify(cache.cached(
+        _analytics_key('cohorts', scope),
+        lambda: analytics.compute_cohorts(_customer_frame(scope))))
+
+
+@api_bp.route('/basket')
+@login_required
+@coalesced
+def basket():
+    """
+    Frequently-bought-together pairs with support, confidence and lift.
+
+    ?product=X → best partners of X; otherwise the strongest pairs overall.
+    ?sort=lift|confidence|count, ?min_count= and ?limit= tune the list.
+    The co-occurrence matrix is built on first use and cached per upload.
+    """
+    scope = _get_scope()
+    if not scope:
+        return jsonify({'pairs': []})
+    from utils.basket import build_basket
+    model = cache.cached(
+        _analytics_key('basket', scope),
+        lambda: build_basket(_scope_frame(scope, SalesRecord.invoice_no,
+                                          SalesRecord.party_name, SalesRecord.product)))
+
+    limit     = int(request.args.get('limit', 10))
+    min_count = int(request.args.get('min_count', 2))
+    sort      = request.args.get('sort', 'lift')
+    product   = request.args.get('product', 'all')
+    if product and product != 'all':
+        idx = model.index.get(product)
+        return jsonify({
+            'product':  product,
+            'invoices': int(model.item_count[idx]) if idx is not None else 0,
+            'pairs':    model.for_product(product, limit, min_count, sort),
+        })
+    return jsonify({
+        'invoices': model.n_invoices,
+        'pairs':    model.top_pairs(limit, min_count, sort),
+    })
+
+
 @api_bp.route('/category-list')
 @login_required
+@coalesced
+@precomputed
 def category_list():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
-    rows = (SalesRecord.query.filter_by(upload_id=upload.id)
-             .with_entities(SalesRecord.category, func.sum(SalesRecord.amount).label('total'))
-             .group_by(SalesRecord.category)
-             .order_by(func.sum(SalesRecord.amount).desc())
-             .all())
-    return jsonify([{'category': r.category, 'total': round(r.total, 2)} for r in rows])
+    col = _columnar_source(scope)
+    if col:
+        rows = col.group('category', order_by='total', total=('amount_paise', 'sum'))
+    else:
+        rows = (_scope_filter(SalesRecord.query, scope)
+                 .with_entities(SalesRecord.category, _paise_sum().label('total'))
+                 .group_by(SalesRecord.category)
+                 .order_by(_paise_sum().desc())
+                 .all())
+    return jsonify([{'category': r.category, 'total': rupees(r.total)} for r in rows])
 
 
 @api_bp.route('/product-list')
 @login_required
+@coalesced
 def product_list():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify([])
     cat = request.args.get('category', 'all')
-    q = SalesRecord.query.filter_by(upload_id=upload.id)
+    col = _columnar_source(scope)
+    if col:
+        return jsonify(col.where(category=cat).distinct('product'))
+    q = _scope_filter(SalesRecord.query, scope)
     if cat and cat != 'all':
         q = q.filter(SalesRecord.category == cat)
     rows = (q.with_entities(SalesRecord.product)
@@ -249,17 +1017,84 @@ def product_list():
     return jsonify([r.product for r in rows])
 
 
+def _prefix_index(upload, field):
+    """
+    The upload's PrefixIndex for `field`, mapped once per worker, or None
+    if it predates the suggest file. A missing file is not cached, so the
+    index is picked up as soon as `flask backfill-columnar` writes it.
+    """
+    from utils.columnar import open_columnar
+    from utils.suggest import PrefixIndex, suggest_path
+    path = suggest_path(current_app.config['UPLOAD_FOLDER'], upload.stored_name)
+    if not os.path.exists(path):
+        return None
+    return cache.cached(('suggest', (upload.stored_name,), field),
+                        lambda: PrefixIndex(open_columnar(path), field))
+
+
+@api_bp.route('/suggest')
+@login_required
+@coalesced
+def suggest():
+    """
+    Typeahead for the filter pickers: ?field=product|party_name&q=...
+    The top ?limit= (10, at most 50) values with a word starting with q,
+    by revenue; products also honour ?category=. Empty q lists the top
+    values. ?exact=1 returns only a value whose whole text is q, to check
+    a typed or pasted one. Served from each upload's prefix index (utils/suggest.py),
+    mapped once per worker; uploads ingested before it existed fall back
+    to a substring scan of sales_records.
+    """
+    from utils.suggest import FIELDS, normalize, top_matches
+    field = request.args.get('field', 'product')
+    if field not in FIELDS:
+        abort(400, description=f"field must be one of {'|'.join(FIELDS)}")
+    scope = _get_scope()
+    if not scope:
+        return jsonify([])
+    limit = min(int(request.args.get('limit', 10)), 50)
+    q     = normalize(request.args.get('q', ''))
+    cat   = request.args.get('category', 'all') if field == 'product' else 'all'
+    exact = request.args.get('exact') == '1'
+    if exact and not q:
+        return jsonify([])
+
+    indexes = [_prefix_index(u, field) for u in scope]
+    if all(ix is not None for ix in indexes):
+        rows = top_matches(indexes, q, cat, limit, exact)
+    else:
+        col = getattr(SalesRecord, field)
+        sq  = _scope_filter(SalesRecord.query, scope)
+        if exact:
+            sq = sq.filter(func.lower(func.trim(col)) == q)
+        elif q:
+            sq = sq.filter(func.lower(col).contains(q, autoescape=True))
+        if cat and cat != 'all':
+            sq = sq.filter(SalesRecord.category == cat)
+        total = _paise_sum()
+        rows = (sq.filter(col.isnot(None), col != '', col != 'Unknown')
+                .with_entities(col, func.max(SalesRecord.category), total)
+                .group_by(col)
+                .order_by(total.desc(), col)
+                .limit(limit).all())
+
+    return jsonify([{
+        'value': value, 'amount': rupees(paise),
+        **({'category': category} if field == 'product' else {}),
+    } for value, category, paise in rows])
+
+
 @api_bp.route('/transactions')
 @login_required
 def transactions():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify({'records': [], 'total': 0, 'pages': 0})
     page     = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 50))
     search   = request.args.get('search', '').strip()
     sort_by  = request.args.get('sort', 'amount')
-    q = _apply_filters(SalesRecord.query, upload.id)
+    q = _apply_filters(SalesRecord.query, scope)
     if search:
         like = f'%{search}%'
         q = q.filter(db.or_(
@@ -268,9 +1103,9 @@ def transactions():
             SalesRecord.invoice_no.ilike(like),
             SalesRecord.category.ilike(like),
         ))
-    sort_map = {'amount': SalesRecord.amount.desc(), 'date': SalesRecord.sale_date.desc(),
+    sort_map = {'amount': SalesRecord.amount_paise.desc(), 'date': SalesRecord.sale_date.desc(),
                 'party': SalesRecord.party_name.asc(), 'product': SalesRecord.product.asc()}
-    q = q.order_by(sort_map.get(sort_by, SalesRecord.amount.desc()))
+    q = q.order_by(sort_map.get(sort_by, SalesRecord.amount_paise.desc()))
     total   = q.count()
     records = q.offset((page - 1) * per_page).limit(per_page).all()
     return jsonify({
@@ -281,14 +1116,20 @@ def transactions():
 
 @api_bp.route('/date-bounds')
 @login_required
+@coalesced
+@precomputed
 def date_bounds():
-    upload = _get_active_upload()
-    if not upload:
+    scope = _get_scope()
+    if not scope:
         return jsonify({})
-    row = (SalesRecord.query
-           .filter(SalesRecord.upload_id == upload.id, SalesRecord.sale_date.isnot(None))
-           .with_entities(func.min(SalesRecord.sale_date), func.max(SalesRecord.sale_date))
-           .one())
+    col = _columnar_source(scope)
+    if col:
+        row = col.aggregate(dmin=('sale_date', 'min'), dmax=('sale_date', 'max'))
+    else:
+        row = (_scope_filter(SalesRecord.query, scope)
+               .filter(SalesRecord.sale_date.isnot(None))
+               .with_entities(func.min(SalesRecord.sale_date), func.max(SalesRecord.sale_date))
+               .one())
     return jsonify({
         'min': row[0].strftime('%Y-%m-%d') if row[0] else '',
         'max': row[1].strftime('%Y-%m-%d') if row[1] else '',
@@ -302,7 +1143,48 @@ def uploads():
              .order_by(Upload.uploaded_at.desc()).all())
     return jsonify([{
         'id': u.id, 'name': u.original_name,
-        'records': u.record_count, 'amount': round(u.total_amount, 2),
+        'records': u.record_count, 'amount': rupees(u.total_amount_paise),
         'uploaded_at': u.uploaded_at.strftime('%d %b %Y, %H:%M'),
-        'is_active': u.is_active,
+        'is_active': u.is_active, 'archived': u.rows_archived,
     } for u in rows])
+
+
+@api_bp.route('/uploads/<int:upload_id>/restore', methods=['POST'])
+@login_required
+def restore_upload(upload_id):
+    """Bring an archived upload's rows back so that ?uploads= can query it."""
+    upload = Upload.query.filter_by(id=upload_id, user_id=current_user.id).first_or_404()
+    rows = 0
+    if upload.rows_archived:
+        rows = retention.restore_rows(upload, current_app.config['UPLOAD_FOLDER'])
+    return jsonify({'id': upload.id, 'restored': rows, 'archived': upload.rows_archived})
+
+
+@api_bp.route('/retention-policy', methods=['GET', 'PUT'])
+@login_required
+def retention_policy():
+    """
+    The current user's retention policy (see utils/retention.py). PUT a
+    JSON object with any of compress_raw_days / delete_raw_days /
+    archive_rows_days: days, 0 to turn a step off, null for the default.
+    """
+    policy = RetentionPolicy.query.filter_by(user_id=current_user.id).first()
+    if request.method == 'PUT':
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or set(body) - set(retention.POLICY_FIELDS):
+            abort(400, description=f'Expected a JSON object with {list(retention.POLICY_FIELDS)}')
+        for field, value in body.items():
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)
+                                      or value < 0):
+                abort(400, description=f"'{field}' must be a non-negative number of days or null")
+        if policy is None:
+            policy = RetentionPolicy(user_id=current_user.id)
+            db.session.add(policy)
+        for field, value in body.items():
+            setattr(policy, field, value)
+        db.session.commit()
+
+    return jsonify({
+        'policy':   {f: getattr(policy, f) if policy else None for f in retention.POLICY_FIELDS},
+        'effective': retention.effective_policy(policy, current_app.config),
+    })
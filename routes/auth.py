@@ -3,6 +3,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from datetime import datetime
 
 from models import db, User
+from utils import context
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -23,6 +24,7 @@ def login():
         if user and user.check_password(password):
             user.last_login = datetime.utcnow()
             db.session.commit()
+            context.bump(user.id)
             login_user(user, remember=remember)
             flash(f'Welcome back, {user.full_name or user.username}!', 'success')
             next_page = request.args.get('next')
@@ -1,14 +1,17 @@
 import os
+import json
 import uuid
-from datetime import date, timedelta
+import threading
+from datetime import date, timedelta, datetime
 
-import pandas as pd
 from flask import (Blueprint, render_template, request, redirect,
                    url_for, flash, current_app, jsonify, session)
 from flask_login import login_required, current_user
 
-from models import db, Upload, SalesRecord
-from utils.parser import parse_sales_file, categorize_product
+from models import db, Upload, SalesRecord, UploadSketch, SalesSample
+from utils.ingest import parse_files_parallel
+from utils import cache, context, retention
+from routes.api import warm_in_background
 
 main_bp = Blueprint('main', __name__)
 
@@ -37,76 +40,200 @@ def dashboard():
 @main_bp.route('/upload', methods=['POST'])
 @login_required
 def upload_file():
-    if 'file' not in request.files:
+    """
+    Accepts one or more files under the 'file' field. Files are parsed in
+    parallel on a process pool and written to the DB one at a time; the
+    last file of the batch becomes the active upload. A 'mapping' /
+    'header_row' confirmed in the preview applies to every file.
+    """
+    files = [f for f in request.files.getlist('file') if f.filename]
+    if not files:
         flash('No file selected.', 'error')
         return redirect(url_for('main.dashboard'))
-
-    file = request.files['file']
-    if file.filename == '':
-        flash('No file selected.', 'error')
+    try:
+        options = _parse_options()
+    except ValueError as e:
+        flash(f'Invalid column mapping: {e}', 'error')
         return redirect(url_for('main.dashboard'))
 
+    multi   = len(files) > 1
+    results = []
+    jobs    = []
+    for idx, file in enumerate(files):
+        label = f'"{file.filename}": ' if multi else ''
+        ext = file.filename.rsplit('.', 1)[-1].lower()
+        if ext not in current_app.config['ALLOWED_EXTENSIONS']:
+            flash(f'{label}Unsupported file type. Please upload CSV or Excel.', 'error')
+            results.append({'file': file.filename, 'ok': False,
+                            'error': 'Unsupported file type'})
+            continue
+
+        # Save file
+        stored_name = f"{uuid.uuid4().hex}.{ext}"
+        save_path   = os.path.join(current_app.config['UPLOAD_FOLDER'], stored_name)
+        file.save(save_path)
+        jobs.append({'idx': idx, 'name': file.filename, 'label': label,
+                     'stored_name': stored_name, 'path': save_path, 'ext': ext,
+                     'options': options})
+
+    stored = []
+    for job, result, error in parse_files_parallel(jobs, current_app.config.get('INGEST_WORKERS')):
+        if error is None and not result['records']:
+            error = 'No valid sales records found in the file.'
+        if error is not None:
+            os.remove(job['path'])
+            msg = (f'Error parsing file: {error}' if isinstance(error, Exception)
+                   else error)
+            flash(f"{job['label']}{msg}", 'error')
+            results.append({'file': job['name'], 'ok': False, 'error': str(error)})
+            continue
+
+        try:
+            upload = _store_upload(job['name'], job['stored_name'], result)
+        except Exception:
+            os.remove(job['path'])          # no row refers to it
+            raise
+        stored.append((job['idx'], upload))
+        flash(f'✅ Success! Processed {result["record_count"]:,} records from "{job["name"]}"', 'success')
+        results.append({'file': job['name'], 'ok': True, 'upload_id': upload.id,
+                        'records': result['record_count']})
+
+    if stored:
+        _activate_upload(max(stored, key=lambda s: s[0])[1])
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'results': results})
+    return redirect(url_for('main.dashboard'))
+
+
+def _parse_options():
+    """
+    Parser overrides from the form: 'mapping' (JSON object, field →
+    column, '' for none) and 'header_row' (0-based). ValueError if malformed.
+    """
+    options = {}
+    raw = request.form.get('mapping', '').strip()
+    if raw:
+        mapping = json.loads(raw)
+        if not isinstance(mapping, dict):
+            raise ValueError("'mapping' must be a JSON object of field → column")
+        options['mapping'] = mapping
+    raw = request.form.get('header_row', '').strip()
+    if raw:
+        options['header_row'] = int(raw)
+        if options['header_row'] < 0:
+            raise ValueError("'header_row' must be 0 or more")
+    return options
+
+
+@main_bp.route('/upload/preview', methods=['POST'])
+@login_required
+def upload_preview():
+    """
+    Detected header row, column mapping, a few parsed rows and a row-count
+    estimate for one file, read from the head of the upload — nothing is
+    saved. Takes the same 'file' field as /upload plus optional 'rows'
+    (rows to parse, default 200), 'size' (full file size when the client
+    only sends the head of a CSV), and 'mapping' / 'header_row' to preview
+    an override before the real upload.
+    """
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return jsonify({'error': 'No file selected.'}), 400
     ext = file.filename.rsplit('.', 1)[-1].lower()
     if ext not in current_app.config['ALLOWED_EXTENSIONS']:
-        flash('Unsupported file type. Please upload CSV or Excel.', 'error')
-        return redirect(url_for('main.dashboard'))
-
-    # Save file
-    stored_name = f"{uuid.uuid4().hex}.{ext}"
-    save_path   = os.path.join(current_app.config['UPLOAD_FOLDER'], stored_name)
-    file.save(save_path)
+        return jsonify({'error': 'Unsupported file type. Please upload CSV or Excel.'}), 400
+    try:
+        options = _parse_options()
+        nrows   = min(max(int(request.form.get('rows', 200)), 1), 2000)
+        size    = int(request.form['size']) if request.form.get('size') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
+    from utils.parser import preview_sales_file
     try:
-        result = parse_sales_file(save_path, ext)
+        preview = preview_sales_file(file.stream, ext, nrows, total_size=size, **options)
     except Exception as e:
-        os.remove(save_path)
-        flash(f'Error parsing file: {str(e)}', 'error')
-        return redirect(url_for('main.dashboard'))
-
-    if not result['records']:
-        os.remove(save_path)
-        flash('No valid sales records found in the file.', 'error')
-        return redirect(url_for('main.dashboard'))
-
-    # Deactivate previous uploads
+        return jsonify({'error': f'Could not read file: {e}'}), 400
+    return jsonify({'file': file.filename, **preview})
+
+
+# Parsed files are written through a single writer so that concurrent
+# batches never interleave their bulk inserts on the same connection pool.
+_write_lock = threading.Lock()
+
+
+def _store_upload(original_name, stored_name, result):
+    """Create the Upload row (inactive) and bulk insert its records."""
+    # Large uploads also get sketches + a stratified sample for ?approx=1
+    synopses = None
+    if result['record_count'] >= current_app.config['APPROX_MIN_ROWS']:
+        from utils.approx import build_synopses
+        synopses = build_synopses(result['records'],
+                                  current_app.config['APPROX_SAMPLE_SIZE'])
+
+    with _write_lock:
+        upload = Upload(
+            user_id         = current_user.id,
+            original_name   = original_name,
+            stored_name     = stored_name,
+            record_count    = result['record_count'],
+            total_amount_paise= result['total_amount_paise'],
+            unique_customers= result['unique_customers'],
+            unique_products = result['unique_products'],
+            unique_invoices = result['unique_invoices'],
+            date_from       = result['date_from'],
+            date_to         = result['date_to'],
+            is_active       = False
+        )
+        db.session.add(upload)
+        db.session.flush()
+
+        # Bulk insert records
+        db.session.bulk_insert_mappings(SalesRecord, [
+            {**r, 'upload_id': upload.id} for r in result['records']
+        ])
+        if synopses:
+            sketch_rows, sample_rows = synopses
+            db.session.bulk_insert_mappings(UploadSketch, [
+                {**r, 'upload_id': upload.id} for r in sketch_rows
+            ])
+            db.session.bulk_insert_mappings(SalesSample, [
+                {**r, 'upload_id': upload.id} for r in sample_rows
+            ])
+        db.session.commit()
+
+    # Columnar copy for the Arrow analytics backend (see utils/columnar.py).
+    # Written once the row exists, so a failed commit leaves no files
+    # that no upload owns; the upload is not active before this returns.
+    from utils.columnar import columnar_path, write_columnar, write_table
+    write_columnar(columnar_path(current_app.config['UPLOAD_FOLDER'], stored_name),
+                   result['records'])
+
+    # Prefix index behind /api/suggest (see utils/suggest.py)
+    from utils.suggest import build_index, suggest_path
+    write_table(suggest_path(current_app.config['UPLOAD_FOLDER'], stored_name),
+                build_index(result['records']))
+    return upload
+
+
+def _activate_upload(upload):
+    """Make `upload` the user's only active upload and queue its dashboard warm-up."""
     Upload.query.filter_by(user_id=current_user.id, is_active=True)\
-                .update({'is_active': False})
-
-    # Create upload record
-    upload = Upload(
-        user_id         = current_user.id,
-        original_name   = file.filename,
-        stored_name     = stored_name,
-        record_count    = result['record_count'],
-        total_amount    = result['total_amount'],
-        unique_customers= result['unique_customers'],
-        unique_products = result['unique_products'],
-        unique_invoices = result['unique_invoices'],
-        date_from       = result['date_from'],
-        date_to         = result['date_to'],
-        is_active       = True
-    )
-    db.session.add(upload)
-    db.session.flush()
-
-    # Bulk insert records
-    db.session.bulk_insert_mappings(SalesRecord, [
-        {**r, 'upload_id': upload.id} for r in result['records']
-    ])
+                .update({'is_active': False, 'deactivated_at': datetime.utcnow()})
+    upload.is_active      = True
+    upload.deactivated_at = None
     db.session.commit()
-
-    flash(f'✅ Success! Processed {result["record_count"]:,} records from "{file.filename}"', 'success')
-    return redirect(url_for('main.dashboard'))
+    retention.ensure_restored([upload], current_app.config['UPLOAD_FOLDER'])
+    context.bump(current_user.id)
+    warm_in_background(upload.id)
 
 
 @main_bp.route('/switch-upload/<int:upload_id>')
 @login_required
 def switch_upload(upload_id):
     upload = Upload.query.filter_by(id=upload_id, user_id=current_user.id).first_or_404()
-    Upload.query.filter_by(user_id=current_user.id, is_active=True)\
-                .update({'is_active': False})
-    upload.is_active = True
-    db.session.commit()
+    _activate_upload(upload)
     flash(f'Switched to "{upload.original_name}"', 'success')
     return redirect(url_for('main.dashboard'))
 
@@ -115,10 +242,14 @@ def switch_upload(upload_id):
 @login_required
 def delete_upload(upload_id):
     upload = Upload.query.filter_by(id=upload_id, user_id=current_user.id).first_or_404()
-    stored = os.path.join(current_app.config['UPLOAD_FOLDER'], upload.stored_name)
-    if os.path.exists(stored):
-        os.remove(stored)
+    paths = retention.upload_paths(current_app.config['UPLOAD_FOLDER'], upload.stored_name)
+    for path in paths.values():
+        if os.path.exists(path):
+            os.remove(path)
+    stored_name = upload.stored_name
     db.session.delete(upload)
     db.session.commit()
+    context.bump(current_user.id)
+    cache.invalidate_upload(stored_name)
     flash('Upload deleted.', 'info')
     return redirect(url_for('main.dashboard'))
@@ -0,0 +1,105 @@
+"""
+Float rupees vs integer paise benchmark.
+
+Builds the same synthetic sales table twice in a scratch SQLite file —
+amounts as REAL rupees (the old schema) and as INTEGER paise (the
+current one, see utils/money.py) — and times the dashboard's aggregate
+shapes on both, plus the same sums in Arrow. Also shows the float drift
+that integer paise remove: summing the same amounts in a different row
+order gives a different float total.
+
+    python scripts/bench_money.py [--rows 1000000] [--runs 5]
+"""
+import os
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+import time
+
+CATEGORIES = ['Rice', 'Oils', 'Millets', 'Honey', 'Spices', 'Flours', 'Coffee', 'Ghee & Butter']
+QUERIES = {
+    'total':         'SELECT SUM({amt}) FROM {t}',
+    'by category':   'SELECT category, SUM({amt}) FROM {t} GROUP BY category',
+    'by month':      'SELECT month_key, SUM({amt}) FROM {t} GROUP BY month_key ORDER BY month_key',
+    'top customers': 'SELECT party_name, SUM({amt}) s FROM {t} GROUP BY party_name ORDER BY s DESC LIMIT 10',
+}
+
+
+def _rows(n, seed):
+    rng = random.Random(seed)
+    for _ in range(n):
+        paise = rng.randint(1_000, 2_500_000)
+        yield (f'2024-{rng.randint(1, 12):02d}', f'Customer {rng.randint(1, 5000)}',
+               rng.choice(CATEGORIES), paise)
+
+
+def _build(path, n):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE rupees (month_key TEXT, party_name TEXT, category TEXT, amount REAL);
+        CREATE TABLE paise  (month_key TEXT, party_name TEXT, category TEXT, amount_paise INTEGER);
+    ''')
+    rows = list(_rows(n, seed=1))
+    conn.executemany('INSERT INTO rupees VALUES (?, ?, ?, ?)',
+                     ((m, p, c, a / 100) for m, p, c, a in rows))
+    conn.executemany('INSERT INTO paise VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    return conn, rows
+
+
+def _time(fn, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--rows', type=int, default=1_000_000)
+    ap.add_argument('--runs', type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn, rows = _build(os.path.join(tmp, 'bench.db'), args.rows)
+        print(f'rows        : {args.rows:,}')
+        print(f'{"query":<14}  {"REAL rupees":>12}  {"INTEGER paise":>14}  speedup')
+        for name, sql in QUERIES.items():
+            real = _time(lambda: conn.execute(sql.format(t='rupees', amt='amount')).fetchall(), args.runs)
+            intg = _time(lambda: conn.execute(sql.format(t='paise', amt='amount_paise')).fetchall(), args.runs)
+            print(f'{name:<14}  {real * 1000:>9.1f} ms  {intg * 1000:>11.1f} ms  {real / intg:>6.2f}x')
+        conn.close()
+
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        pa = None
+    if pa:
+        paise = pa.array([r[3] for r in rows], pa.int64())
+        table = pa.table({'category': pa.array([r[2] for r in rows]).dictionary_encode(),
+                          'amount':   pc.divide(paise.cast(pa.float64()), 100),
+                          'amount_paise': paise})
+        for label, fn in (
+                ('arrow sum', lambda col: pc.sum(table[col])),
+                ('arrow group', lambda col: table.group_by('category').aggregate([(col, 'sum')]))):
+            f = _time(lambda: fn('amount'), args.runs)
+            i = _time(lambda: fn('amount_paise'), args.runs)
+            print(f'{label:<14}  {f * 1000:>9.1f} ms  {i * 1000:>11.1f} ms  {f / i:>6.2f}x')
+
+    # same amounts, three row orders: floats disagree in the paise, ints never do
+    amounts = [r[3] for r in rows]
+    totals  = set()
+    for seed in range(3):
+        random.Random(seed).shuffle(amounts)
+        totals.add(sum(a / 100 for a in amounts))
+    print(f'float totals: {len(totals)} distinct over 3 row orders '
+          f'(spread ₹{max(totals) - min(totals):.6f}); paise total: ₹{sum(amounts) / 100:,.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Worker cold-start benchmark.
+
+Imports the app in a fresh interpreter several times — what every
+gunicorn worker (or `python app.py`) pays before serving its first
+request — and reports wall time, resident memory and which heavy
+libraries got pulled in along the way.
+
+    python scripts/bench_startup.py [--runs 7]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT  = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ['pandas', 'numpy', 'scipy', 'openpyxl', 'xlrd']
+
+_CHILD = r'''
+import sys, time, json
+t0 = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t0
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    'import_s': elapsed,
+    'rss_mb':   rss_kb / 1024,
+    'heavy':    [m for m in %r if m in sys.modules],
+}))
+'''
+
+
+def _run_once(env):
+    proc = subprocess.run([sys.executable, '-c', _CHILD % HEAVY], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--runs', type=int, default=7)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                   PYTHONDONTWRITEBYTECODE='1')
+        _run_once(env)                     # warm the OS file cache, create the DB file
+        runs = [_run_once(env) for _ in range(args.runs)]
+
+    times = [r['import_s'] for r in runs]
+    print(f'runs        : {len(runs)}')
+    print(f'import app  : median {statistics.median(times) * 1000:.0f} ms '
+          f'(min {min(times) * 1000:.0f}, max {max(times) * 1000:.0f})')
+    print(f'rss         : median {statistics.median(r["rss_mb"] for r in runs):.1f} MB')
+    print(f'heavy libs  : {", ".join(runs[-1]["heavy"]) or "none"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Concurrent ingest + dashboard reads against a local SQLite file.
+
+Starts several writer processes that upload CSVs and several reader
+processes that hammer the dashboard API at the same time — the situation
+that used to end in 'database is locked'. Exits non-zero if any request
+failed.
+
+    python scripts/check_db_concurrency.py [--writers 3] [--readers 4] [--uploads 3] [--rows 5000]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing as mp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTS = ['Rice - Idly Rice', 'Oil - Groundnut Oil - 1 Litre', 'Palm Jaggery - 1 Kg',
+            'Ragi Flour', 'Moringa Powder', 'Forest Honey', 'Cow Ghee', 'Toor Dal']
+READ_URLS = ['/api/stats', '/api/monthly', '/api/categories', '/api/top-products?limit=12',
+             '/api/top-customers?limit=10', '/api/transactions?page=1&per_page=50',
+             '/api/stats?category=Rice', '/api/product-trend?date_from=2024-06-01']
+
+
+def _write_csv(path, rows, seed):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write('Date,Party Name,Invoice No.,Product,Quantity,Amount\n')
+        for i in range(rows):
+            f.write(f'{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024,'
+                    f'Customer {rng.randint(1, 400)},{i // 4},{rng.choice(PRODUCTS)},'
+                    f'{rng.randint(1, 5)},{rng.randint(50, 5000)}.{rng.randint(0, 99):02d}\n')
+
+
+def _client(workdir):
+    sys.path.insert(0, ROOT)
+    from app import app
+    app.config['UPLOAD_FOLDER'] = workdir
+    c = app.test_client()
+    c.post('/login', data={'identifier': 'admin', 'password': 'kaadu@2024'})
+    return c
+
+
+def _writer(workdir, csv_path, uploads, results):
+    c = _client(workdir)
+    ok = fail = 0
+    for n in range(uploads):
+        with open(csv_path, 'rb') as f:
+            r = c.post('/upload', data={'file': (f, f'w{os.getpid()}-{n}.csv')},
+                       content_type='multipart/form-data', headers={'Accept': 'application/json'})
+        if r.status_code == 200 and all(x['ok'] for x in r.get_json()['results']):
+            ok += 1
+        else:
+            fail += 1
+            results.put(('error', f'upload {r.status_code}: {r.get_data(as_text=True)[:200]}'))
+    results.put(('writer', ok, fail))
+
+
+def _reader(workdir, stop, results):
+    c = _client(workdir)
+    ok = fail = 0
+    while not stop.is_set():
+        url = random.choice(READ_URLS)
+        try:
+            r = c.get(url)
+            good = r.status_code in (200, 404)      # 404: no upload yet
+        except Exception as e:                      # noqa: BLE001 — report any failure
+            good, r = False, e
+        if good:
+            ok += 1
+        else:
+            fail += 1
+            results.put(('error', f'GET {url}: {getattr(r, "status_code", r)}'))
+    results.put(('reader', ok, fail))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--writers', type=int, default=3)
+    ap.add_argument('--readers', type=int, default=4)
+    ap.add_argument('--uploads', type=int, default=3, help='uploads per writer')
+    ap.add_argument('--rows',    type=int, default=5000, help='rows per CSV')
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kaadu-concurrency-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'kaadu.db')
+    csv_path = os.path.join(workdir, 'sales.csv')
+    _write_csv(csv_path, args.rows, seed=1)
+
+    # create the schema + admin once, before the workers race for it
+    sys.path.insert(0, ROOT)
+    from app import app, bootstrap
+    bootstrap(app)
+
+    ctx     = mp.get_context('spawn')
+    results = ctx.Queue()
+    stop    = ctx.Event()
+    writers = [ctx.Process(target=_writer, args=(workdir, csv_path, args.uploads, results))
+               for _ in range(args.writers)]
+    readers = [ctx.Process(target=_reader, args=(workdir, stop, results))
+               for _ in range(args.readers)]
+
+    start = time.perf_counter()
+    for p in writers + readers:
+        p.start()
+    for p in writers:
+        p.join()
+    stop.set()
+    for p in readers:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    totals = {'writer': [0, 0], 'reader': [0, 0]}
+    errors = []
+    while not results.empty():
+        kind, *rest = results.get()
+        if kind == 'error':
+            errors.append(rest[0])
+        else:
+            totals[kind][0] += rest[0]
+            totals[kind][1] += rest[1]
+
+    print(f'database : {os.environ["DATABASE_URL"]}')
+    print(f'elapsed  : {elapsed:.1f}s')
+    print(f'uploads  : {totals["writer"][0]} ok, {totals["writer"][1]} failed')
+    print(f'reads    : {totals["reader"][0]} ok, {totals["reader"][1]} failed')
+    for e in errors[:10]:
+        print('  ✗', e)
+    failed = totals['writer'][1] + totals['reader'][1]
+    print('PASS' if not failed else 'FAIL')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Per-worker caches across a delete and re-upload, with two app processes.
+
+SQLite hands a deleted upload's id to the next upload, and a delete only
+clears the caches of the worker that served it. This runs two workers on
+one database: B reads an upload (filling its caches), A deletes it and
+uploads a different file, which gets the same id, then B reads again.
+Each answer B gives is compared with that of a freshly started worker.
+Exits non-zero if B served anything from the deleted upload.
+
+    python scripts/check_upload_reuse.py
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import multiprocessing as mp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READ_URLS = ['/api/stats?category=Rice', '/api/monthly?category=Rice',
+             '/api/rfm', '/api/cohorts', '/api/basket?min_count=1',
+             '/api/stats?approx=1', '/api/top-products?approx=1',
+             '/api/suggest?field=product&q=ri']
+
+
+def _write_csv(path, rows, amount, products):
+    with open(path, 'w') as f:
+        f.write('Date,Party Name,Invoice No.,Product,Quantity,Amount\n')
+        for i in range(rows):
+            f.write(f'{i % 28 + 1:02d}/{i % 12 + 1:02d}/2024,Customer {i % 7},'
+                    f'{i // 2},{products[i % len(products)]},1,{amount}\n')
+
+
+def _worker(workdir, commands, replies):
+    """One app process: runs ('get', url) / ('upload', path) / ('delete', id) commands."""
+    sys.path.insert(0, ROOT)
+    from app import app
+    app.config['UPLOAD_FOLDER'] = workdir
+    c = app.test_client()
+    c.post('/login', data={'identifier': 'admin', 'password': 'kaadu@2024'})
+    while (cmd := commands.get()) is not None:
+        op, arg = cmd
+        if op == 'get':
+            r = c.get(arg)
+            replies.put((r.status_code, r.get_json()))
+        elif op == 'upload':
+            with open(arg, 'rb') as f:
+                r = c.post('/upload', data={'file': (f, os.path.basename(arg))},
+                           content_type='multipart/form-data',
+                           headers={'Accept': 'application/json'})
+            replies.put(r.get_json()['results'][0])
+        elif op == 'delete':
+            replies.put(c.post(f'/delete-upload/{arg}').status_code)
+
+
+class Worker:
+    def __init__(self, ctx, workdir):
+        self.commands, self.replies = ctx.Queue(), ctx.Queue()
+        self.proc = ctx.Process(target=_worker, args=(workdir, self.commands, self.replies))
+        self.proc.start()
+
+    def __call__(self, op, arg):
+        self.commands.put((op, arg))
+        return self.replies.get(timeout=120)
+
+    def read_all(self):
+        return {url: self('get', url) for url in READ_URLS}
+
+    def stop(self):
+        self.commands.put(None)
+        self.proc.join()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='kaadu-reuse-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'kaadu.db')
+    os.environ['CONTEXT_VERSION_FILE'] = os.path.join(workdir, 'context-versions')
+    os.environ['APPROX_MIN_ROWS'] = '1'            # sketches + sample for ?approx=1
+    old_csv, new_csv = os.path.join(workdir, 'old.csv'), os.path.join(workdir, 'new.csv')
+    _write_csv(old_csv, 50, 100, ['Rice - Idly Rice', 'Ragi Flour', 'Cow Ghee'])
+    _write_csv(new_csv, 20, 999, ['Rice - Mappillai Samba', 'Forest Honey'])
+
+    sys.path.insert(0, ROOT)
+    from app import app, bootstrap
+    bootstrap(app)
+
+    ctx  = mp.get_context('spawn')
+    a, b = Worker(ctx, workdir), Worker(ctx, workdir)
+    old  = a('upload', old_csv)
+    b.read_all()                                    # B caches the old upload
+    a('delete', old['upload_id'])
+    new  = a('upload', new_csv)
+    seen = b.read_all()
+    a.stop()
+    b.stop()
+
+    fresh = Worker(ctx, workdir)
+    want  = fresh.read_all()
+    fresh.stop()
+
+    print(f'database : {os.environ["DATABASE_URL"]}')
+    print(f'uploads  : old.csv #{old["upload_id"]}, new.csv #{new["upload_id"]}'
+          + (' (id reused)' if old['upload_id'] == new['upload_id'] else ''))
+    stale = [url for url in READ_URLS if seen[url] != want[url]]
+    for url in READ_URLS:
+        print(f'  {"✗" if url in stale else "✓"} {url}')
+        if url in stale:
+            print(f'      worker B : {json.dumps(seen[url])[:160]}')
+            print(f'      expected : {json.dumps(want[url])[:160]}')
+    print('PASS' if not stale else 'FAIL')
+    sys.exit(1 if stale else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,504 @@
+"""
+Concurrent-user load test of the dashboard.
+
+Simulates N logged-in users replaying what templates/dashboard/index.html
+requests. Each user does the page load (init() + loadAllCharts()), then a
+mix of filter changes, the drill tab, transactions paging and customer
+search, with think time in between. Runs on asyncio with a small built-in
+HTTP/1.1 client (up to 6 keep-alive connections per user, like a
+browser), so it needs no outside services.
+
+Without --url the app is started on a free local port against a scratch
+database, seeded with one generated upload. The server is the threaded
+dev server by default, or gunicorn with gunicorn.conf.py via
+--server gunicorn. With --url it drives a server that is already running,
+as --user (whose active upload is queried).
+
+Reports throughput and p50/p95/p99 latency and error rate per endpoint.
+--json also writes them to a file, for comparing runs. Exits non-zero
+above --max-error-rate.
+
+    python scripts/load_test.py [--users 50] [--duration 60] [--think 2] [--rows 20000]
+    python scripts/load_test.py --server gunicorn --workers 4 --threads 4
+    python scripts/load_test.py --url http://127.0.0.1:5000 --user admin --password kaadu@2024
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUCTS = ['Rice - Idly Rice', 'Rice - Mappillai Samba', 'Oil - Groundnut Oil - 1 Litre',
+            'Oil - Sesame Oil - 500 ml', 'Palm Jaggery - 1 Kg', 'Ragi Flour', 'Moringa Powder',
+            'Forest Honey', 'Cow Ghee', 'Toor Dal', 'Kodo Millet', 'Filter Coffee Powder']
+CONNECTIONS_PER_USER = 6        # what browsers open per host
+KEYSTROKE_S          = 0.12     # between typed characters
+SUGGEST_DEBOUNCE_S   = 0.15     # suggestInto() in the dashboard
+
+
+# ─────────────────────────────────────────────────
+# HTTP
+# ─────────────────────────────────────────────────
+class Stats:
+    """Latency samples and failures per endpoint (path without the query)."""
+
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.errors  = defaultdict(Counter)
+
+    def record(self, name, seconds, error=None):
+        self.latency[name].append(seconds)
+        if error:
+            self.errors[name][error] += 1
+
+
+class Client:
+    """One simulated browser: a small keep-alive connection pool and a cookie jar."""
+
+    def __init__(self, host, port, stats, timeout):
+        self.host, self.port = host, port
+        self.stats   = stats
+        self.timeout = timeout
+        self.cookies = {}
+        self._idle  = []
+        self._slots = asyncio.Semaphore(CONNECTIONS_PER_USER)
+
+    async def request(self, method, path, body=b'', headers=None, name=None):
+        """(status, headers, body); status 0 when the request failed outright."""
+        name = name or path.split('?')[0]
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            t0 = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = await asyncio.open_connection(self.host, self.port)
+                status, resp_headers, data, keep = await asyncio.wait_for(
+                    self._exchange(conn, method, path, body, headers or {}), self.timeout)
+            except asyncio.TimeoutError:
+                self._close(conn)
+                self.stats.record(name, time.perf_counter() - t0, 'timeout')
+                return 0, {}, b''
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                self._close(conn)
+                self.stats.record(name, time.perf_counter() - t0, type(e).__name__)
+                return 0, {}, b''
+            self.stats.record(name, time.perf_counter() - t0,
+                              f'HTTP {status}' if status >= 400 else None)
+            if keep:
+                self._idle.append(conn)
+            else:
+                self._close(conn)
+            return status, resp_headers, data
+
+    async def get_json(self, path):
+        status, _, data = await self.request('GET', path, headers={'Accept': 'application/json'})
+        return json.loads(data) if status == 200 else None
+
+    async def _exchange(self, conn, method, path, body, headers):
+        reader, writer = conn
+        head = {'Host': f'{self.host}:{self.port}', 'Connection': 'keep-alive',
+                'Content-Length': str(len(body)), **headers}
+        if self.cookies:
+            head['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        writer.write(f'{method} {path} HTTP/1.1\r\n'.encode()
+                     + ''.join(f'{k}: {v}\r\n' for k, v in head.items()).encode()
+                     + b'\r\n' + body)
+        await writer.drain()
+
+        version, status = (await reader.readuntil(b'\r\n')).decode('latin-1').split()[:2]
+        resp_headers = {}
+        while (line := await reader.readuntil(b'\r\n')) != b'\r\n':
+            key, _, value = line.decode('latin-1').partition(':')
+            key, value = key.strip().lower(), value.strip()
+            if key == 'set-cookie':
+                k, _, v = value.split(';', 1)[0].partition('=')
+                self.cookies[k.strip()] = v.strip()
+            resp_headers[key] = value
+
+        keep = version == 'HTTP/1.1' and resp_headers.get('connection', '').lower() != 'close'
+        if 'content-length' in resp_headers:
+            data = await reader.readexactly(int(resp_headers['content-length']))
+        elif resp_headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = b''
+            while size := int((await reader.readuntil(b'\r\n')).split(b';')[0], 16):
+                data += await reader.readexactly(size)
+                await reader.readexactly(2)
+            await reader.readuntil(b'\r\n')
+        else:
+            data, keep = await reader.read(), False
+        return int(status), resp_headers, data, keep
+
+    @staticmethod
+    def _close(conn):
+        if conn is not None:
+            conn[1].close()
+
+    def close(self):
+        while self._idle:
+            self._close(self._idle.pop())
+
+
+async def login(client, user, password) -> bool:
+    body = urlencode({'identifier': user, 'password': password}).encode()
+    status, headers, _ = await client.request(
+        'POST', '/login', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    return status == 302 and '/login' not in headers.get('location', '')
+
+
+def _multipart(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+            f'filename="{filename}"\r\nContent-Type: text/csv\r\n\r\n').encode() \
+        + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+# ─────────────────────────────────────────────────
+# THE DASHBOARD, AS A BROWSER DRIVES IT
+# Mirrors the fetches of templates/dashboard/index.html; the function
+# names are those of the page's JS.
+# ─────────────────────────────────────────────────
+class User:
+    def __init__(self, client, rng):
+        self.c   = client
+        self.rng = rng
+        self.F   = {'category': 'all', 'product': 'all', 'date_from': '', 'date_to': ''}
+        self.tab = 'dashboard'
+        self.bounds     = None
+        self.categories = []
+        self.products   = []            # the product <datalist>
+        self.customers  = []
+        self.tx_pages   = 1
+
+    def qs(self):
+        F = self.F
+        return urlencode({k: v for k, v in (
+            ('category', F['category'] if F['category'] != 'all' else ''),
+            ('product',  F['product']  if F['product']  != 'all' else ''),
+            ('date_from', F['date_from']), ('date_to', F['date_to'])) if v})
+
+    async def think(self, mean):
+        if mean > 0:
+            await asyncio.sleep(self.rng.expovariate(1 / mean))
+
+    # ── page ──────────────────────────────────────
+    async def page_load(self):
+        await self.c.request('GET', '/dashboard')
+        self.tab = 'dashboard'
+        self.F   = {'category': 'all', 'product': 'all', 'date_from': '', 'date_to': ''}
+        self.bounds = await self.c.get_json('/api/date-bounds')
+        self.categories = [c['category'] for c in await self.c.get_json('/api/category-list') or []]
+        await self.suggest_into('product', '')
+        await self.load_all_charts()
+
+    async def load_all_charts(self):
+        q = self.qs()
+        await asyncio.gather(*(self.c.get_json(url + q) for url in (
+            '/api/stats?', '/api/monthly?', '/api/categories?',
+            '/api/top-products?limit=12&', '/api/top-customers?limit=10&',
+            '/api/categories?', '/api/product-trend?',
+            '/api/product-breakdown?limit=8&', '/api/top-products?limit=30&')))
+
+    async def apply_all_filters(self):
+        jobs = [self.load_all_charts()]
+        if self.tab == 'transactions':
+            jobs.append(self.load_transactions(1))
+        if self.tab == 'drill':
+            jobs.append(self.load_drill_tab())
+        await asyncio.gather(*jobs)
+
+    async def suggest_into(self, field, q):
+        params = {'field': field, 'q': q, 'limit': 12}
+        if field == 'product' and self.F['category'] != 'all':
+            params['category'] = self.F['category']
+        rows = await self.c.get_json('/api/suggest?' + urlencode(params)) or []
+        values = [r['value'] for r in rows]
+        if field == 'product':
+            self.products = values
+        else:
+            self.customers = values or self.customers
+
+    async def load_drill_tab(self):
+        q = self.qs()
+        await asyncio.gather(*(self.c.get_json(url + q) for url in (
+            '/api/stats?', '/api/product-breakdown?limit=25&', '/api/product-trend?',
+            '/api/top-customers?limit=10&', '/api/product-breakdown?limit=100&')))
+
+    async def load_transactions(self, page, search='', sort='amount'):
+        d = await self.c.get_json(f'/api/transactions?page={page}&per_page=50&'
+                                  f'{urlencode({"search": search, "sort": sort})}&{self.qs()}')
+        if d:
+            self.tx_pages = max(d.get('pages') or 1, 1)
+
+    # ── what users do between page loads ──────────
+    async def pick_category(self):
+        self.F['category'] = self.rng.choice(['all'] + self.categories)
+        self.F['product']  = 'all'
+        await self.suggest_into('product', '')          # repopulateProducts()
+        await self.apply_all_filters()
+
+    async def pick_product(self):
+        if not self.products:
+            return
+        target = self.rng.choice(self.products)
+        for n in (2, 4):                                # debounced keystrokes
+            await asyncio.sleep(n * KEYSTROKE_S + SUGGEST_DEBOUNCE_S)
+            await self.suggest_into('product', target[:n])
+        self.F['product'] = target
+        await self.apply_all_filters()
+
+    async def date_preset(self):
+        if not self.bounds or not self.bounds.get('max'):
+            return
+        months = self.rng.choice([0, 3, 6, 12])
+        end = date.fromisoformat(self.bounds['max'][:10])
+        self.F['date_from'] = (end - timedelta(days=30 * months)).isoformat() if months else ''
+        self.F['date_to']   = self.bounds['max'][:10] if months else ''
+        await self.apply_all_filters()
+
+    async def reset_filters(self):
+        self.F.update(category='all', product='all', date_from='', date_to='')
+        await self.suggest_into('product', '')
+        await self.apply_all_filters()
+
+    async def drill_tab(self):
+        self.tab = 'drill'
+        await self.load_drill_tab()
+
+    async def page_transactions(self):
+        if self.tab != 'transactions':
+            self.tab = 'transactions'
+            await self.load_transactions(1)
+        for page in range(2, 2 + self.rng.randint(0, 3)):
+            if page > self.tx_pages:
+                break
+            await self.think(1.0)
+            await self.load_transactions(page, sort=self.rng.choice(['amount', 'date']))
+
+    async def search_customer(self):
+        """Typing in the transaction search: every keystroke refetches the table."""
+        self.tab = 'transactions'
+        name = self.rng.choice(self.customers) if self.customers else 'customer 1'
+        pending = []
+        for n in range(1, self.rng.randint(3, 6)):
+            pending.append(asyncio.ensure_future(self.load_transactions(1, search=name[:n])))
+            await asyncio.sleep(KEYSTROKE_S)
+        await asyncio.sleep(SUGGEST_DEBOUNCE_S)
+        pending.append(asyncio.ensure_future(self.suggest_into('party_name', name[:n])))
+        await asyncio.gather(*pending)
+
+    ACTIONS = {                 # name → relative weight
+        'pick_category':     3,
+        'pick_product':      2,
+        'date_preset':       2,
+        'reset_filters':     1,
+        'drill_tab':         2,
+        'page_transactions': 3,
+        'search_customer':   2,
+        'page_load':         1,
+    }
+
+
+async def run_user(n, host, port, args, stats, start_at, deadline):
+    await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+    rng    = random.Random(args.seed + n)
+    client = Client(host, port, stats, args.timeout)
+    user   = User(client, rng)
+    names, weights = zip(*User.ACTIONS.items())
+    try:
+        if not await login(client, args.user, args.password):
+            stats.errors['/login']['rejected'] += 1
+            return
+        await user.page_load()
+        while time.monotonic() < deadline:
+            await user.think(args.think)
+            if time.monotonic() >= deadline:
+                break
+            await getattr(user, rng.choices(names, weights)[0])()
+    finally:
+        client.close()
+
+
+# ─────────────────────────────────────────────────
+# LOCAL SERVER
+# ─────────────────────────────────────────────────
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _write_csv(path, rows, seed):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write('Date,Party Name,Invoice No.,Product,Quantity,Amount\n')
+        for i in range(rows):
+            f.write(f'{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024,'
+                    f'Customer {rng.randint(1, 2000)},{i // 4},{rng.choice(PRODUCTS)},'
+                    f'{rng.randint(1, 5)},{rng.randint(50, 5000)}.{rng.randint(0, 99):02d}\n')
+
+
+def start_server(args, workdir):
+    """Bootstrap a scratch database and start the app; returns (process, port)."""
+    port = _free_port()
+    env  = {**os.environ,
+            'DATABASE_URL':  'sqlite:///' + os.path.join(workdir, 'load.db'),
+            'UPLOAD_FOLDER': os.path.join(workdir, 'uploads')}
+    subprocess.run([sys.executable, '-c', 'from app import app, bootstrap; bootstrap(app)'],
+                   cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+    if args.server == 'gunicorn':
+        cmd = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+               '--workers', str(args.workers), '--threads', str(args.threads),
+               '--access-logfile', '/dev/null']
+    else:
+        cmd = [sys.executable, '-c',
+               'import sys; from werkzeug.serving import run_simple; from app import app; '
+               'run_simple("127.0.0.1", int(sys.argv[1]), app, threaded=True)', str(port)]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(300):
+        if proc.poll() is not None:
+            sys.exit(f'server exited with code {proc.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    sys.exit('server did not start')
+
+
+async def seed(host, port, args, csv_path):
+    client = Client(host, port, Stats(), timeout=600)
+    try:
+        if not await login(client, args.user, args.password):
+            sys.exit('seed: login failed')
+        with open(csv_path, 'rb') as f:
+            body, ctype = _multipart('file', 'load-test.csv', f.read())
+        status, _, data = await client.request(
+            'POST', '/upload', body, {'Content-Type': ctype, 'Accept': 'application/json'})
+        if status != 200 or not all(r['ok'] for r in json.loads(data)['results']):
+            sys.exit(f'seed: upload failed ({status}): {data[:200]!r}')
+    finally:
+        client.close()
+
+
+# ─────────────────────────────────────────────────
+# REPORT
+# ─────────────────────────────────────────────────
+def _pct(sorted_values, p):
+    """Nearest-rank percentile."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))]
+
+
+def summarize(stats, elapsed):
+    def row(samples, errors):
+        s = sorted(samples)
+        n = len(s)
+        return {'requests': n, 'rps': n / elapsed, 'errors': sum(errors.values()),
+                'error_rate': sum(errors.values()) / n if n else 0.0,
+                'p50_ms': _pct(s, 50) * 1000, 'p95_ms': _pct(s, 95) * 1000,
+                'p99_ms': _pct(s, 99) * 1000, 'max_ms': (s[-1] if s else 0) * 1000,
+                'error_kinds': dict(errors)}
+
+    endpoints = {name: row(stats.latency[name], stats.errors[name])
+                 for name in sorted(stats.latency, key=lambda k: -len(stats.latency[k]))}
+    total = row([x for v in stats.latency.values() for x in v],
+                sum(stats.errors.values(), Counter()))
+    return endpoints, total
+
+
+def print_report(endpoints, total, header):
+    print(header)
+    print(f'{"endpoint":<26} {"reqs":>7} {"rps":>7} {"err%":>6} '
+          f'{"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}')
+    for name, r in [*endpoints.items(), ('all', total)]:
+        if name == 'all':
+            print('-' * 84)
+        print(f'{name:<26} {r["requests"]:>7,} {r["rps"]:>7.1f} {r["error_rate"] * 100:>5.1f}% '
+              f'{r["p50_ms"]:>6.0f}ms {r["p95_ms"]:>6.0f}ms {r["p99_ms"]:>6.0f}ms {r["max_ms"]:>6.0f}ms')
+    for name, r in endpoints.items():
+        if r['errors']:
+            kinds = ', '.join(f'{k} ×{v}' for k, v in r['error_kinds'].items())
+            print(f'  ! {name}: {kinds}')
+
+
+async def run(args, host, port):
+    stats = Stats()
+    now   = time.monotonic()
+    start = [now + i * args.ramp / args.users for i in range(args.users)]
+    deadline = now + args.ramp + args.duration
+    t0 = time.perf_counter()
+    await asyncio.gather(*(run_user(i, host, port, args, stats, start[i], deadline)
+                           for i in range(args.users)))
+    return stats, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--users', type=int, default=50, help='simulated concurrent users')
+    ap.add_argument('--duration', type=float, default=60, help='seconds of load after ramp-up')
+    ap.add_argument('--ramp', type=float, default=5, help='seconds over which users log in')
+    ap.add_argument('--think', type=float, default=2.0,
+                    help='mean think time between actions in seconds (0: back to back)')
+    ap.add_argument('--timeout', type=float, default=30, help='per-request timeout in seconds')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--url', help='drive an already running server instead of starting one')
+    ap.add_argument('--user', default='admin')
+    ap.add_argument('--password', default='kaadu@2024')
+    ap.add_argument('--server', choices=['dev', 'gunicorn'], default='dev',
+                    help='local server: threaded dev server or gunicorn (gunicorn.conf.py)')
+    ap.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    ap.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    ap.add_argument('--rows', type=int, default=20_000, help='rows in the seeded upload')
+    ap.add_argument('--json', help='also write the results to this file')
+    ap.add_argument('--max-error-rate', type=float, default=0.01,
+                    help='exit non-zero above this overall error rate')
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = None
+        if args.url:
+            parts = urlsplit(args.url)
+            host, port, target = parts.hostname, parts.port or 80, args.url
+        else:
+            proc, port = start_server(args, tmp)
+            host = '127.0.0.1'
+            target = (f'local {args.server}'
+                      + (f' ({args.workers}×{args.threads})' if args.server == 'gunicorn' else ''))
+            csv_path = os.path.join(tmp, 'seed.csv')
+            _write_csv(csv_path, args.rows, args.seed)
+            asyncio.run(seed(host, port, args, csv_path))
+            target += f', {args.rows:,} rows'
+        try:
+            stats, elapsed = asyncio.run(run(args, host, port))
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait()
+
+    endpoints, total = summarize(stats, elapsed)
+    print_report(endpoints, total,
+                 f'{args.users} users · {elapsed:.0f}s · think {args.think:g}s · {target}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'users': args.users, 'elapsed_s': elapsed, 'think_s': args.think,
+                       'target': target, 'endpoints': endpoints, 'total': total}, f, indent=2)
+    if not total['requests'] or total['error_rate'] > args.max_error_rate:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+
+def _month_index(dates: pd.Series) -> pd.Series:
+    """Months since year 0 — cheap integer arithmetic for cohort ages."""
+    return dates.dt.year * 12 + dates.dt.month - 1
+
+
+def _score(values: pd.Series, ascending=True) -> np.ndarray:
+    """Quintile score 1-5 from percentile rank (safe for < 5 customers)."""
+    pct = values.rank(method='first', ascending=ascending, pct=True)
+    return np.ceil(pct.to_numpy() * 5).astype(int).clip(1, 5)
+
+
+# ─────────────────────────────────────────────────
+# RFM  (recency, frequency, monetary)
+# ─────────────────────────────────────────────────
+RFM_SEGMENTS = ['Champions', 'Loyal', 'New', 'At Risk', 'Lost', 'Needs Attention']
+
+
+def compute_rfm(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per customer with recency (days since last purchase, relative
+    to the day after the latest sale), frequency (distinct invoices),
+    monetary (total amount, in paise), 1-5 scores and a segment label.
+
+    `df` needs party_name, invoice_no, sale_date (datetime64) and amount_paise.
+    """
+    df = df[df['party_name'].notna() & (df['party_name'] != 'Unknown')
+            & df['sale_date'].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=['customer', 'recency', 'frequency', 'monetary',
+                                     'r', 'f', 'm', 'score', 'segment'])
+
+    as_of = df['sale_date'].max() + pd.Timedelta(days=1)
+    # group on integer codes rather than the party strings themselves
+    codes, names = pd.factorize(df['party_name'])
+    n = len(names)
+
+    last_sale = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(last_sale, codes, df['sale_date'].to_numpy('datetime64[ns]').view(np.int64))
+    # integer sums: bincount's weights would add the paise as floats
+    monetary  = np.zeros(n, dtype=np.int64)
+    np.add.at(monetary, codes, df['amount_paise'].to_numpy(np.int64))
+
+    # distinct (customer, invoice) pairs; rows without an invoice number
+    # count as one purchase each
+    inv_codes, inv_names = pd.factorize(df['invoice_no'], use_na_sentinel=False)
+    blank     = np.asarray(pd.isna(inv_names) | (pd.Index(inv_names) == ''))
+    has_inv   = ~blank[inv_codes]
+    width     = len(inv_names)
+    pairs     = np.sort(codes[has_inv].astype(np.int64) * width + inv_codes[has_inv])
+    pairs     = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+    frequency = (np.bincount(pairs // width, minlength=n)
+                 + np.bincount(codes[~has_inv], minlength=n))
+
+    rfm = pd.DataFrame({
+        'recency':   (as_of - pd.to_datetime(last_sale)).days,
+        'frequency': frequency,
+        'monetary':  monetary,
+    }, index=pd.Index(names, name='customer'))
+
+    rfm['r'] = _score(rfm['recency'], ascending=False)
+    rfm['f'] = _score(rfm['frequency'])
+    rfm['m'] = _score(rfm['monetary'])
+    rfm['score'] = rfm['r'] * 100 + rfm['f'] * 10 + rfm['m']
+
+    r, f = rfm['r'], rfm['f']
+    rfm['segment'] = np.select(
+        [(r >= 4) & (f >= 4), (r >= 3) & (f >= 3), (r >= 4) & (f <= 2),
+         (r <= 2) & (f >= 3), (r <= 2) & (f <= 2)],
+        RFM_SEGMENTS[:5], default=RFM_SEGMENTS[5])
+
+    return (rfm.reset_index()
+               .sort_values('monetary', ascending=False, ignore_index=True))
+
+
+# ─────────────────────────────────────────────────
+# MONTHLY ACQUISITION COHORTS
+# ─────────────────────────────────────────────────
+def compute_cohorts(df: pd.DataFrame) -> dict:
+    """
+    Customers grouped by the month of their first purchase; for each
+    cohort the share still buying 0, 1, 2 … months later.
+    """
+    df = df[df['party_name'].notna() & (df['party_name'] != 'Unknown')
+            & df['sale_date'].notna()]
+    if df.empty:
+        return {'cohorts': [], 'max_age': 0}
+
+    month  = _month_index(df['sale_date'])
+    first  = month.groupby(df['party_name']).transform('min')
+    active = (pd.DataFrame({'cohort': first, 'age': month - first,
+                            'party': df['party_name']})
+                .drop_duplicates())
+    counts = active.groupby(['cohort', 'age']).size().unstack(fill_value=0).sort_index()
+    sizes  = counts[0]
+    retention = counts.div(sizes, axis=0).round(4)
+    last   = int(month.max())
+
+    # ages past the end of the data are unknown, not zero — cut them off
+    return {
+        'max_age': int(counts.columns.max()),
+        'cohorts': [{
+            'cohort':    f'{idx // 12}-{idx % 12 + 1:02d}',
+            'size':      int(sizes[idx]),
+            'customers': counts.loc[idx].iloc[:last - idx + 1].astype(int).tolist(),
+            'retention': retention.loc[idx].iloc[:last - idx + 1].tolist(),
+        } for idx in counts.index],
+    }
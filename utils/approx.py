@@ -0,0 +1,187 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+# ─────────────────────────────────────────────────
+# APPROXIMATE QUERY MODE
+# Large uploads get two synopses at ingest, both stratified by
+# (month_key, category):
+#   • HyperLogLog registers per stratum for party / product / invoice, so
+#     distinct counts under category + date filters are a register max-merge
+#   • a random row sample per stratum, so sums and top-N lists are
+#     stratified estimates with a 95 % error bound
+# ─────────────────────────────────────────────────
+HLL_P      = 11
+HLL_M      = 1 << HLL_P
+_REST_BITS = 64 - HLL_P
+HLL_REL_ERROR = 1.04 / np.sqrt(HLL_M)      # ≈ 2.3 % standard error
+Z95        = 1.96
+MIN_PER_STRATUM = 30
+
+SKETCH_FIELDS = {'customers': 'party_name', 'products': 'product', 'invoices': 'invoice_no'}
+
+
+def _hash(values: pd.Series):
+    """Register index and rank (leading zeros + 1) for every value."""
+    h    = pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy(np.uint64)
+    idx  = (h >> np.uint64(_REST_BITS)).astype(np.intp)
+    # < 2^53, so the float conversion is exact and frexp gives floor(log2)+1
+    rest = (h & np.uint64((1 << _REST_BITS) - 1)).astype(np.float64)
+    rank = (_REST_BITS + 1 - np.frexp(rest)[1]).astype(np.uint8)
+    return idx, rank
+
+
+def _stratum_registers(codes, n_strata, values: pd.Series) -> np.ndarray:
+    regs = np.zeros((n_strata, HLL_M), dtype=np.uint8)
+    ok   = values.notna().to_numpy()
+    if ok.any():
+        idx, rank = _hash(values[ok])
+        np.maximum.at(regs, (codes[ok], idx), rank)
+    return regs
+
+
+def pack_registers(regs: np.ndarray) -> bytes:
+    return zlib.compress(regs.tobytes())
+
+
+def unpack_registers(blob: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype=np.uint8)
+
+
+def hll_estimate(regs: np.ndarray) -> float:
+    alpha = 0.7213 / (1 + 1.079 / HLL_M)
+    est   = alpha * HLL_M * HLL_M / np.sum(np.exp2(-regs.astype(np.float64)))
+    zeros = int((regs == 0).sum())
+    if est <= 2.5 * HLL_M and zeros:
+        est = HLL_M * np.log(HLL_M / zeros)      # linear counting for small sets
+    return float(est)
+
+
+# ─────────────────────────────────────────────────
+# BUILD (at ingest)
+# ─────────────────────────────────────────────────
+def build_synopses(records, sample_size, seed=0):
+    """
+    From parsed records (see utils.parser) return (sketch_rows, sample_rows),
+    both lists of dicts ready for UploadSketch / SalesSample (minus upload_id).
+
+    Each stratum keeps a share of sample_size proportional to its row
+    count, but never fewer than MIN_PER_STRATUM rows (or all of them).
+    """
+    df = pd.DataFrame(records)
+    codes, strata = pd.MultiIndex.from_frame(df[['month_key', 'category']]).factorize()
+    n_strata = len(strata)
+    N = np.bincount(codes, minlength=n_strata)
+
+    sketch_rows = [{'month_key': m, 'category': c, 'row_count': int(N[i])}
+                   for i, (m, c) in enumerate(strata)]
+    for name, col in SKETCH_FIELDS.items():
+        regs = _stratum_registers(codes, n_strata, df[col])
+        for i, row in enumerate(sketch_rows):
+            row[name] = pack_registers(regs[i])
+
+    share = np.round(N * sample_size / max(len(df), 1)).astype(int)
+    n_h   = np.minimum(N, np.maximum(share, np.minimum(N, MIN_PER_STRATUM)))
+    rng   = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(df)), codes))   # by stratum, shuffled within
+    pos   = np.arange(len(df)) - np.repeat(np.cumsum(N) - N, N)
+    keep  = np.sort(order[pos < np.repeat(n_h, N)])
+
+    cols   = ['sale_date', 'month_key', 'party_name', 'invoice_no',
+              'product', 'category', 'quantity', 'amount_paise']
+    sample = df.iloc[keep][cols].astype(object)
+    sample = sample.where(sample.notna(), None)
+    sample['stratum_rows']   = N[codes[keep]]
+    sample['stratum_sample'] = n_h[codes[keep]]
+    return sketch_rows, sample.to_dict('records')
+
+
+# ─────────────────────────────────────────────────
+# ESTIMATE (at query time)
+# ─────────────────────────────────────────────────
+class ApproxSource:
+    """
+    In-memory sample + sketches for one or more uploads.
+
+    `sample` has the SalesSample columns plus upload_id; `sketches` has the
+    UploadSketch columns with registers still packed.
+    """
+
+    def __init__(self, sample: pd.DataFrame, sketches: pd.DataFrame):
+        sample = sample.copy()
+        sample['sale_date'] = pd.to_datetime(sample['sale_date'])
+        sample['stratum'] = pd.MultiIndex.from_frame(
+            sample[['upload_id', 'month_key', 'category']]).factorize()[0]
+        for col in ('amount_paise', 'quantity', 'stratum_rows', 'stratum_sample'):
+            sample[col] = sample[col].astype(float)
+        self.sample = sample
+
+        self.strata    = sketches[['month_key', 'category']].reset_index(drop=True)
+        self.registers = {
+            name: (np.vstack([unpack_registers(b) for b in sketches[name]])
+                   if len(sketches) else np.zeros((0, HLL_M), dtype=np.uint8))
+            for name in SKETCH_FIELDS
+        }
+
+    # ── filters ────────────────────────────────────
+    def mask(self, category=None, date_from='', date_to=''):
+        s = self.sample
+        m = np.ones(len(s), dtype=bool)
+        if category and category != 'all':
+            m &= (s['category'] == category).to_numpy()
+        if date_from:
+            m &= (s['sale_date'] >= pd.Timestamp(date_from)).to_numpy()
+        if date_to:
+            m &= (s['sale_date'] <= pd.Timestamp(date_to)).to_numpy()
+        return m
+
+    # ── sums / counts ──────────────────────────────
+    def totals(self, mask, by=None, value='amount_paise') -> pd.DataFrame:
+        """
+        Stratified estimate of sum(value) over the masked rows — row count
+        when value is None — overall or per `by` column.
+        Returns a frame with 'est' and 'err' (95 % half-width).
+        """
+        s = self.sample[mask]
+        keys  = ['stratum'] if by is None else [by, 'stratum']
+        frame = s[keys].assign(
+            z=1.0 if value is None else s[value],
+            N=s['stratum_rows'], n=s['stratum_sample'])
+        frame['z2'] = frame['z'] ** 2
+        g = (frame.groupby(keys, sort=False)
+                  .agg(sz=('z', 'sum'), sz2=('z2', 'sum'), N=('N', 'first'), n=('n', 'first')))
+
+        # unmasked sample rows are zeros of the same stratum: they count in n_h
+        est = g['N'] / g['n'] * g['sz']
+        s2  = ((g['sz2'] - g['sz'] ** 2 / g['n']) / (g['n'] - 1).clip(lower=1)).where(g['n'] > 1, 0)
+        var = g['N'] ** 2 * (1 - g['n'] / g['N']) * s2.clip(lower=0) / g['n']
+
+        if by is None:
+            return pd.DataFrame({'est': [est.sum()], 'err': [Z95 * np.sqrt(var.sum())]})
+        return pd.DataFrame({
+            'est': est.groupby(level=0, sort=False).sum(),
+            'err': Z95 * np.sqrt(var.groupby(level=0, sort=False).sum()),
+        })
+
+    # ── distinct counts ────────────────────────────
+    def distinct(self, name, category=None, date_from='', date_to=''):
+        """
+        (estimate, 95 % error) of distinct values of a sketched field.
+        Date filters apply at month granularity here.
+        """
+        st = self.strata
+        m  = np.ones(len(st), dtype=bool)
+        if category and category != 'all':
+            m &= (st['category'] == category).to_numpy()
+        if date_from or date_to:
+            m &= (st['month_key'] != 'Unknown').to_numpy()
+        if date_from:
+            m &= (st['month_key'] >= date_from[:7]).to_numpy()
+        if date_to:
+            m &= (st['month_key'] <= date_to[:7]).to_numpy()
+        if not m.any():
+            return 0, 0
+        est = hll_estimate(self.registers[name][m].max(axis=0))
+        return round(est), round(Z95 * HLL_REL_ERROR * est)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+# ─────────────────────────────────────────────────
+# MARKET BASKET  ("frequently bought together")
+# Invoices × products is a 0/1 sparse incidence matrix X; Xᵀ·X then holds
+# every pair's co-occurrence count, with single-product counts on the
+# diagonal. No Python loops over invoices or pairs.
+# ─────────────────────────────────────────────────
+class Basket:
+    def __init__(self, products, item_count, pairs, n_invoices):
+        self.products   = products      # code → product name
+        self.index      = {p: i for i, p in enumerate(products)}
+        self.item_count = item_count    # invoices containing each product
+        self.pairs      = pairs         # csr co-occurrence, zero diagonal
+        self.n_invoices = n_invoices
+
+    def _metrics(self, a, b, count):
+        n = self.n_invoices or 1
+        support    = count / n
+        confidence = count / self.item_count[a]
+        lift       = confidence / (self.item_count[b] / n)
+        return support, confidence, lift
+
+    def for_product(self, product, limit=10, min_count=1, sort='lift'):
+        """Products most often bought together with `product`."""
+        i = self.index.get(product)
+        if i is None:
+            return []
+        row   = self.pairs.getrow(i)
+        other = row.indices
+        count = row.data.astype(float)
+        keep  = count >= min_count
+        other, count = other[keep], count[keep]
+        support, confidence, lift = self._metrics(i, other, count)
+
+        key   = {'count': count, 'confidence': confidence}.get(sort, lift)
+        order = np.lexsort((-count, -key))[:limit]
+        return [{
+            'product':    self.products[other[k]],
+            'count':      int(count[k]),
+            'support':    round(float(support[k]), 4),
+            'confidence': round(float(confidence[k]), 4),
+            'lift':       round(float(lift[k]), 3),
+        } for k in order]
+
+    def top_pairs(self, limit=20, min_count=2, sort='lift'):
+        """Strongest pairs across the whole catalogue (each pair once)."""
+        upper = sparse.triu(self.pairs, k=1).tocoo()
+        keep  = upper.data >= min_count
+        a, b, count = upper.row[keep], upper.col[keep], upper.data[keep].astype(float)
+        support, conf_ab, lift = self._metrics(a, b, count)
+        conf_ba = count / self.item_count[b]
+
+        key   = {'count': count, 'confidence': np.maximum(conf_ab, conf_ba)}.get(sort, lift)
+        order = np.lexsort((-count, -key))[:limit]
+        return [{
+            'a':             self.products[a[k]],
+            'b':             self.products[b[k]],
+            'count':         int(count[k]),
+            'support':       round(float(support[k]), 4),
+            'confidence_ab': round(float(conf_ab[k]), 4),
+            'confidence_ba': round(float(conf_ba[k]), 4),
+            'lift':          round(float(lift[k]), 3),
+        } for k in order]
+
+
+def build_basket(df: pd.DataFrame) -> Basket:
+    """
+    `df` needs invoice_no, party_name and product. An invoice is identified
+    by invoice_no + party (numbers can repeat across branches / uploads);
+    rows with no invoice number or product are ignored.
+    """
+    df = df[(df['invoice_no'].fillna('') != '') & (df['product'].fillna('') != '')]
+    inv_codes = df.groupby(['invoice_no', 'party_name'], sort=False).ngroup().to_numpy()
+    prod_codes, products = pd.factorize(df['product'])
+    n_inv, n_prod = (int(inv_codes.max()) + 1 if len(inv_codes) else 0), len(products)
+
+    X = sparse.csr_matrix(
+        (np.ones(len(df), dtype=np.int32), (inv_codes, prod_codes)),
+        shape=(n_inv, n_prod))
+    X.sum_duplicates()
+    X.data[:] = 1                   # same product twice on one invoice counts once
+
+    co = (X.T @ X).tocsr()
+    item_count = co.diagonal().astype(float)
+    co.setdiag(0)
+    co.eliminate_zeros()
+    return Basket(list(products), item_count, co, n_inv)
@@ -0,0 +1,37 @@
+import threading
+from collections import OrderedDict
+
+
+# ─────────────────────────────────────────────────
+# PER-UPLOAD RESULT CACHE
+# Upload rows never change after ingest, so whole-upload analytics are
+# cached by (kind, stored names, options) and only dropped on delete or
+# when the LRU limit is reached. Keys use Upload.stored_name (a uuid),
+# not the id: SQLite hands a deleted upload's id to the next one, and a
+# delete only clears the cache of the worker that served it.
+# Kept free of pandas so routes can import it without paying for it.
+# ─────────────────────────────────────────────────
+_CACHE_SIZE = 32
+_cache      = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached(key, compute):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    value = compute()
+    with _cache_lock:
+        _cache[key] = value
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+
+def invalidate_upload(stored_name):
+    """Drop every cached result that was computed from the upload `stored_name`."""
+    with _cache_lock:
+        for key in [k for k in _cache if stored_name in k[1]]:
+            del _cache[key]
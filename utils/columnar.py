@@ -0,0 +1,187 @@
+import os
+from datetime import date
+from collections import namedtuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# ─────────────────────────────────────────────────
+# COLUMNAR UPLOAD STORE
+# Every upload is also written as an Arrow IPC file next to the raw file
+# in UPLOAD_FOLDER. Text columns are dictionary-encoded, so repeated
+# customers / products / categories are stored once. The file itself is
+# not block-compressed: buffers are read straight out of a memory map
+# with no copy or decode, and every worker on the host shares the same
+# page-cache pages instead of holding its own copy.
+# ─────────────────────────────────────────────────
+SCHEMA = pa.schema([
+    ('sale_date',      pa.date32()),
+    ('month_key',      pa.dictionary(pa.int32(), pa.string())),
+    ('party_name',     pa.dictionary(pa.int32(), pa.string())),
+    ('invoice_no',     pa.dictionary(pa.int32(), pa.string())),
+    ('product',        pa.dictionary(pa.int32(), pa.string())),
+    ('category',       pa.dictionary(pa.int32(), pa.string())),
+    ('quantity',       pa.float64()),
+    ('unit',           pa.dictionary(pa.int32(), pa.string())),
+    ('price_per_unit_paise', pa.int64()),      # money is integer paise
+    ('amount_paise',   pa.int64()),
+])
+
+
+def columnar_path(upload_folder, stored_name):
+    """'<folder>/<stem>.arrow' for the raw upload `stored_name`."""
+    return os.path.join(upload_folder, os.path.splitext(stored_name)[0] + '.arrow')
+
+
+def records_table(records) -> pa.Table:
+    """Parsed records (see utils.parser) as a SCHEMA table."""
+    arrays = []
+    for field in SCHEMA:
+        values = [r.get(field.name) for r in records]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def write_table(path, table: pa.Table, compression=None):
+    """
+    Write `table` to `path` atomically. Pass compression='zstd' only for
+    files that are read back whole (archives) — compressed buffers cannot
+    be served from a memory map.
+    """
+    tmp = path + '.tmp'
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.OSFile(tmp, 'wb') as sink, \
+            pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table, max_chunksize=256 * 1024)
+    os.replace(tmp, path)
+
+
+def write_columnar(path, records):
+    """Write parsed records to `path` as the mmap-able columnar file."""
+    write_table(path, records_table(records))
+
+
+def open_columnar(path) -> pa.Table:
+    """Memory-map `path`; columns are views into the page cache."""
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_columnar(path) -> pa.Table:
+    """Read `path` (compressed or not) fully into memory."""
+    with pa.OSFile(path, 'rb') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def migrate_money(path, compression=None) -> bool:
+    """
+    Rewrite a file written with float rupee columns (price_per_unit,
+    amount) in the current SCHEMA of integer paise. False if it already is.
+    """
+    with pa.OSFile(path, 'rb') as source:
+        if 'amount' not in pa.ipc.open_file(source).schema.names:
+            return False
+    table = read_columnar(path)
+    for name in ('price_per_unit', 'amount'):
+        paise = pc.round(pc.multiply(table[name], 100)).cast(pa.int64())
+        table = table.set_column(table.schema.get_field_index(name), name + '_paise', paise)
+    write_table(path, table.select(SCHEMA.names), compression=compression)
+    return True
+
+
+# ─────────────────────────────────────────────────
+# QUERIES
+# ─────────────────────────────────────────────────
+# aggregate spec: result name → (column, function); functions are the
+# SQL ones the API uses — sum, min, max, count (rows), count_distinct
+_COUNT_ALL = pc.CountOptions(mode='all')
+
+
+class ColumnarSource:
+    """Rows of one or more uploads, queried with Arrow compute kernels."""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    @classmethod
+    def combine(cls, tables):
+        if len(tables) == 1:
+            return cls(tables[0])
+        # files carry their own dictionaries; grouping needs one per column
+        return cls(pa.concat_tables(tables).unify_dictionaries())
+
+    def where(self, category=None, product=None, date_from='', date_to='',
+              months_only=False):
+        """
+        A filtered copy, matching api._apply_filters: category / product
+        'all' or empty means no filter; dates are inclusive ISO strings.
+        months_only drops rows without a usable month_key.
+        """
+        t = self.table
+        mask = None
+
+        def _and(cond):
+            nonlocal mask
+            mask = cond if mask is None else pc.and_kleene(mask, cond)
+
+        if category and category != 'all':
+            _and(pc.equal(t['category'], category))
+        if product and product != 'all':
+            _and(pc.equal(t['product'], product))
+        if date_from:
+            _and(pc.greater_equal(t['sale_date'], pa.scalar(date.fromisoformat(date_from), pa.date32())))
+        if date_to:
+            _and(pc.less_equal(t['sale_date'], pa.scalar(date.fromisoformat(date_to), pa.date32())))
+        if months_only:
+            _and(pc.not_equal(t['month_key'], 'Unknown'))
+
+        return ColumnarSource(t if mask is None else t.filter(mask))
+
+    def aggregate(self, **aggs):
+        """One row of whole-table aggregates, e.g. total=('amount_paise', 'sum')."""
+        t   = self.table
+        out = {}
+        for name, (col, fn) in aggs.items():
+            if fn == 'count':
+                out[name] = t.num_rows
+            elif fn == 'count_distinct':
+                uniq = pc.unique(t[col])
+                out[name] = len(uniq) - uniq.null_count
+            else:
+                out[name] = getattr(pc, fn)(t[col]).as_py()
+        return namedtuple('Row', out)(**out)
+
+    def grouped(self, keys, **aggs) -> pa.Table:
+        """Grouped aggregates as a table: one column per key, then one per aggregate."""
+        keys  = [keys] if isinstance(keys, str) else list(keys)
+        specs = [(col, 'count', _COUNT_ALL) if fn == 'count' else (col, fn)
+                 for col, fn in aggs.values()]
+        res = self.table.group_by(keys).aggregate(specs)
+        res = res.rename_columns([
+            {f'{col}_{fn}': name for name, (col, fn) in aggs.items()}.get(c, c)
+            for c in res.column_names])
+        # group keys come back dictionary-encoded, which cannot be sorted
+        return pa.table({c: (res[c].cast(res[c].type.value_type)
+                             if pa.types.is_dictionary(res[c].type) else res[c])
+                         for c in res.column_names})
+
+    def group(self, keys, order_by=None, descending=True, limit=None, **aggs):
+        """
+        Grouped aggregates as a list of rows with attribute access, like
+        the SQLAlchemy rows the endpoints already format.
+        """
+        res = self.grouped(keys, **aggs)
+        if order_by:
+            res = res.sort_by([(order_by, 'descending' if descending else 'ascending')])
+        if limit is not None:
+            res = res.slice(0, limit)
+        Row = namedtuple('Row', res.column_names)
+        return [Row(**r) for r in res.to_pylist()]
+
+    def distinct(self, col):
+        """Sorted distinct non-null values of `col`."""
+        return sorted(v for v in pc.unique(self.table[col]).to_pylist() if v is not None)
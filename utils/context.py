@@ -0,0 +1,113 @@
+import os
+import mmap
+import time
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db
+
+
+# ─────────────────────────────────────────────────
+# REQUEST CONTEXT CACHE
+# Before any real work, every API call loads the logged-in User
+# (Flask-Login's user_loader) and usually the user's active Upload. Each
+# worker keeps both as column snapshots for CONTEXT_CACHE_TTL seconds.
+# A snapshot is attached to the request's session with no SQL, so
+# attribute access, relationships and updates work as on a queried row.
+#
+# Entries are stamped with the user's version. Switching, uploading,
+# deleting and logging in all bump it, so a worker never serves a
+# context from before such a change. Versions live in a small
+# memory-mapped file (CONTEXT_VERSION_FILE) shared by every worker on
+# the host. Each bump writes a fresh random stamp rather than an
+# increment, so concurrent bumps need no lock. Workers on other hosts
+# see a change within the TTL.
+# ─────────────────────────────────────────────────
+VERSION_SLOTS = 4096            # users share slots modulo this; a clash only costs a miss
+_STAMP        = 8               # bytes per slot
+_MAX_ENTRIES  = 4096
+
+_entries      = OrderedDict()   # (kind, user_id) → (stamp, expires, snapshot)
+_entries_lock = threading.Lock()
+_maps         = {}              # version file path → mmap
+_maps_lock    = threading.Lock()
+
+
+def _versions() -> mmap.mmap:
+    path = current_app.config['CONTEXT_VERSION_FILE']
+    mm = _maps.get(path)
+    if mm is None:
+        with _maps_lock:
+            mm = _maps.get(path)
+            if mm is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    if os.fstat(fd).st_size < VERSION_SLOTS * _STAMP:
+                        os.ftruncate(fd, VERSION_SLOTS * _STAMP)
+                    mm = _maps[path] = mmap.mmap(fd, VERSION_SLOTS * _STAMP)
+                finally:
+                    os.close(fd)
+    return mm
+
+
+def _slot(user_id) -> slice:
+    start = (user_id % VERSION_SLOTS) * _STAMP
+    return slice(start, start + _STAMP)
+
+
+def version(user_id) -> bytes:
+    return _versions()[_slot(user_id)]
+
+
+def bump(user_id):
+    """Invalidate every worker's cached context for `user_id`. Call after the commit."""
+    _versions()[_slot(user_id)] = os.urandom(_STAMP)
+
+
+def _snapshot(obj):
+    if obj is None:
+        return None
+    mapper = inspect(obj).mapper
+    return mapper, {a.key: getattr(obj, a.key) for a in mapper.column_attrs}
+
+
+def _attach(snapshot):
+    """A persistent instance in the current session, built from `snapshot` without SQL."""
+    if snapshot is None:
+        return None
+    mapper, values = snapshot
+    obj = mapper.class_manager.new_instance()
+    for key, value in values.items():
+        setattr(obj, key, value)
+    make_transient_to_detached(obj)
+    return db.session.merge(obj, load=False)
+
+
+def cached_row(kind, user_id, load):
+    """
+    The row `load()` returns for `user_id` (or None), served from a
+    snapshot while it is fresh and the user's version has not moved.
+    """
+    ttl = current_app.config['CONTEXT_CACHE_TTL']
+    if not ttl or user_id is None:
+        return load()
+    stamp = version(user_id)            # read before loading: a bump in between wins
+    key   = (kind, user_id)
+    now   = time.monotonic()
+    with _entries_lock:
+        hit = _entries.get(key)
+    if hit and hit[0] == stamp and hit[1] > now:
+        return _attach(hit[2])
+
+    obj = load()
+    with _entries_lock:
+        _entries[key] = (stamp, now + ttl, _snapshot(obj))
+        _entries.move_to_end(key)
+        while len(_entries) > _MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return obj
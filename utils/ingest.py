@@ -0,0 +1,95 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+
+# ─────────────────────────────────────────────────
+# PARALLEL PARSING
+# Parsing is CPU-bound pandas / regex work, so files are spread over a
+# process pool (threads would just contend on the GIL). The pool is created
+# lazily, once per worker process, and sized to the CPU cores unless
+# INGEST_WORKERS says otherwise (gunicorn.conf.py splits the cores between
+# the web workers). Pool processes come from a forkserver, not a fork of
+# the threaded web worker, which can deadlock on a lock held by another
+# thread at fork time. A pool that lost a process (OOM kill, crash) is
+# broken for good, so it is dropped and the next upload starts a new one.
+# ─────────────────────────────────────────────────
+_pool      = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(max_workers=None) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context(method))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _discard_pool(pool):
+    """Forget `pool` if it is still the current one, so get_pool() builds a fresh pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_job(filepath: str, ext: str, options: dict) -> dict:
+    """Runs inside a pool process — must stay a top-level (picklable) function."""
+    from utils.parser import parse_sales_file
+    return parse_sales_file(filepath, ext, **options)
+
+
+def parse_files_parallel(jobs, max_workers=None):
+    """
+    Parse several saved uploads at once.
+
+    `jobs` is a list of dicts that carry at least 'path' and 'ext', and
+    optionally 'options' (keyword arguments for parse_sales_file).
+    Yields (job, result, error) in completion order; exactly one of
+    result / error is None. A single file is parsed in-process since
+    shipping it to the pool only adds pickling overhead.
+    """
+    # pandas (and openpyxl / xlrd through it) load here, on the first
+    # ingest, rather than when a worker boots
+    from utils.parser import parse_sales_file
+    if len(jobs) == 1:
+        job = jobs[0]
+        try:
+            yield job, parse_sales_file(job['path'], job['ext'], **job.get('options', {})), None
+        except Exception as e:
+            yield job, None, e
+        return
+
+    # a pool found broken at submit time broke on an earlier upload, so
+    # that one is retried once on a fresh pool
+    for attempt in (1, 2):
+        pool, futures = get_pool(max_workers), {}
+        try:
+            for job in jobs:
+                futures[pool.submit(_parse_job, job['path'], job['ext'],
+                                    job.get('options', {}))] = job
+            break
+        except BrokenProcessPool as e:
+            _discard_pool(pool)
+            if attempt == 2:
+                for job in jobs:
+                    yield job, None, e
+                return
+
+    for fut in as_completed(futures):
+        job = futures[fut]
+        try:
+            yield job, fut.result(), None
+        except BrokenProcessPool as e:
+            _discard_pool(pool)
+            yield job, None, e
+        except Exception as e:
+            yield job, None, e
@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+
+# ─────────────────────────────────────────────────
+# MONEY
+# Amounts are stored and summed as integer paise (₹1 = 100 paise): sums
+# are exact, independent of row order, and integer adds are cheaper than
+# float ones in SQLite and Arrow alike. Rupees only appear at the edges —
+# parsing (utils/parser.py) and JSON / template output.
+# ─────────────────────────────────────────────────
+PAISE_PER_RUPEE = 100
+
+
+def to_paise(value) -> int:
+    """A rupee amount (number or numeric string) → paise, rounded to the nearest paisa."""
+    return int(round(float(value) * PAISE_PER_RUPEE))
+
+
+def rupees(paise) -> float:
+    """
+    Paise → rupees for output. Takes the int of an exact sum, the float of
+    an estimate, or the Decimal Postgres returns for SUM(bigint).
+    """
+    if paise is None:
+        return 0.0
+    if isinstance(paise, Decimal):
+        paise = float(paise)
+    return round(paise / PAISE_PER_RUPEE, 2)
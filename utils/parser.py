@@ -1,8 +1,11 @@
+import io
 import re
 from datetime import date, timedelta, datetime
 
 import pandas as pd
 
+from utils.money import PAISE_PER_RUPEE, to_paise, rupees
+
 
 # ─────────────────────────────────────────────────
 # COLUMN ALIASES
@@ -68,13 +71,15 @@ _HEADER_KEYWORDS = {
     'product', 'item', 'qty', 'quantity', 'price', 'rate',
 }
 
-def _find_header_row(filepath: str, ext: str) -> int:
+def _find_header_row(filepath, ext: str) -> int:
     """
     Returns the 0-based row index of the true header row.
     Scans the first 10 rows and picks the one whose cells have
     the most matches against known column keywords.
     Returns 0 if nothing better is found (standard files).
+    `filepath` may also be a seekable file object.
     """
+    _rewind(filepath)
     try:
         if ext == 'csv':
             raw = pd.read_csv(filepath, header=None, nrows=10,
@@ -196,7 +201,8 @@ def categorize_product(product: str) -> str:
 # ─────────────────────────────────────────────────
 def _clean_amount(series: pd.Series) -> pd.Series:
     """
-    Strip currency symbols, commas, spaces.
+    Strip currency symbols, commas, spaces and return integer paise
+    (int64), rounded to the nearest paisa.
     Also handles cases where the value is already numeric.
     """
     return (
@@ -206,78 +212,76 @@ def _clean_amount(series: pd.Series) -> pd.Series:
               .str.strip()
               .pipe(pd.to_numeric, errors='coerce')
               .fillna(0)
+              .mul(PAISE_PER_RUPEE)
+              .round()
+              .astype('int64')
     )
 
 
 # ─────────────────────────────────────────────────
-# MAIN PARSER  — called from routes/main.py
+# PARSING STEPS  — shared by the full parse and the preview
 # ─────────────────────────────────────────────────
-def parse_sales_file(filepath: str, ext: str) -> dict:
-    """
-    Robustly parse a CSV or Excel sales file.
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
 
-    Handles:
-    - Extra metadata rows at the top (auto-detects real header row)
-    - Any recognised column naming convention
-    - Excel serial dates, DD/MM/YYYY, YYYY-MM-DD, etc.
-    - Amount values as strings, with symbols or percentage suffixes
-    """
 
-    # ── 1. Find the real header row ────────────────
-    header_row = _find_header_row(filepath, ext)
-
-    # ── 2. Load file with correct header ───────────
+def _read_frame(source, ext: str, header_row: int, nrows=None) -> pd.DataFrame:
+    """Load the sheet as strings under `header_row`, minus empty rows."""
     read_kwargs = dict(
         header     = header_row,
         dtype      = str,          # read everything as string first
         na_values  = ['', 'NA', 'N/A', 'null', 'NULL', 'None', '-'],
         keep_default_na = False,
+        nrows      = nrows,
     )
 
+    _rewind(source)
     if ext == 'csv':
         try:
-            df = pd.read_csv(filepath, encoding='utf-8', **read_kwargs)
+            df = pd.read_csv(source, encoding='utf-8', **read_kwargs)
         except UnicodeDecodeError:
-            df = pd.read_csv(filepath, encoding='latin-1', **read_kwargs)
+            _rewind(source)
+            df = pd.read_csv(source, encoding='latin-1', **read_kwargs)
         except Exception:
-            df = pd.read_csv(filepath, encoding='utf-8',
+            _rewind(source)
+            df = pd.read_csv(source, encoding='utf-8',
                              on_bad_lines='skip', **read_kwargs)
     else:
         engine = 'openpyxl' if ext == 'xlsx' else 'xlrd'
-        df = pd.read_excel(filepath, engine=engine, **read_kwargs)
+        df = pd.read_excel(source, engine=engine, **read_kwargs)
 
     # Strip column names
     df.columns = [str(c).strip() for c in df.columns]
 
     # Drop completely empty rows
     df.dropna(how='all', inplace=True)
+    return df
 
-    # ── 3. Map columns ─────────────────────────────
+
+def _map_columns(columns, overrides=None) -> dict:
+    """
+    field → source column (or None). Auto-detected from COL_ALIASES;
+    `overrides` (field → column name, '' / None to leave a field
+    unmapped) replace the detected choice.
+    """
     col_map = {
-        field: _detect_column(df.columns, aliases)
+        field: _detect_column(columns, aliases)
         for field, aliases in COL_ALIASES.items()
     }
-
-    amount_col = col_map.get('amount')
-    if not amount_col:
-        raise ValueError(
-            f"Could not detect an 'Amount' column.\n"
-            f"Columns found: {list(df.columns)}\n"
-            f"Please ensure your file has a column named one of: "
-            f"{COL_ALIASES['amount']}"
-        )
-
-    # ── 4. Clean & filter by amount ────────────────
-    df['_amount'] = _clean_amount(df[amount_col])
-    df = df[df['_amount'] > 0].copy()
-
-    if df.empty:
-        raise ValueError(
-            "No rows with a positive Amount value found after parsing. "
-            "Check that the Amount column contains numeric sales figures."
-        )
-
-    # ── 5. Build records ───────────────────────────
+    for field, column in (overrides or {}).items():
+        if field not in COL_ALIASES:
+            raise ValueError(f"Unknown field '{field}' in column mapping. "
+                             f"Valid fields: {list(COL_ALIASES)}")
+        if column and column not in columns:
+            raise ValueError(f"Column '{column}' (mapped to {field}) not found.\n"
+                             f"Columns found: {list(columns)}")
+        col_map[field] = column or None
+    return col_map
+
+
+def _build_records(df: pd.DataFrame, col_map: dict):
+    """Records + the sale dates seen, for rows that already carry _amount (paise)."""
     records     = []
     dates_found = []
 
@@ -311,9 +315,9 @@ def parse_sales_file(filepath: str, ext: str) -> dict:
 
         try:
             ppu_raw = gcol(row, 'price_per_unit') or '0'
-            ppu = float(re.sub(r'[^\d.]', '', ppu_raw) or 0)
+            ppu = to_paise(re.sub(r'[^\d.]', '', ppu_raw) or 0)
         except (ValueError, TypeError):
-            ppu = 0.0
+            ppu = 0
 
         records.append({
             'sale_date':     sale_date,
@@ -324,12 +328,63 @@ def parse_sales_file(filepath: str, ext: str) -> dict:
             'category':      category,
             'quantity':      qty,
             'unit':          (gcol(row, 'unit') or '')[:20],
-            'price_per_unit': ppu,
-            'amount':        float(row['_amount']),
+            'price_per_unit_paise': ppu,
+            'amount_paise':  int(row['_amount']),
         })
+    return records, dates_found
+
+
+# ─────────────────────────────────────────────────
+# MAIN PARSER  — called from routes/main.py
+# ─────────────────────────────────────────────────
+def parse_sales_file(filepath: str, ext: str, mapping=None, header_row=None) -> dict:
+    """
+    Robustly parse a CSV or Excel sales file.
+
+    Handles:
+    - Extra metadata rows at the top (auto-detects real header row)
+    - Any recognised column naming convention
+    - Excel serial dates, DD/MM/YYYY, YYYY-MM-DD, etc.
+    - Amount values as strings, with symbols or percentage suffixes
+
+    `mapping` / `header_row` override the detection, e.g. with what the
+    user confirmed from preview_sales_file().
+    """
+
+    # ── 1. Find the real header row ────────────────
+    if header_row is None:
+        header_row = _find_header_row(filepath, ext)
+
+    # ── 2. Load file with correct header ───────────
+    df = _read_frame(filepath, ext, header_row)
+
+    # ── 3. Map columns ─────────────────────────────
+    col_map = _map_columns(df.columns, mapping)
+
+    amount_col = col_map.get('amount')
+    if not amount_col:
+        raise ValueError(
+            f"Could not detect an 'Amount' column.\n"
+            f"Columns found: {list(df.columns)}\n"
+            f"Please ensure your file has a column named one of: "
+            f"{COL_ALIASES['amount']}"
+        )
+
+    # ── 4. Clean & filter by amount ────────────────
+    df['_amount'] = _clean_amount(df[amount_col])
+    df = df[df['_amount'] > 0].copy()
+
+    if df.empty:
+        raise ValueError(
+            "No rows with a positive Amount value found after parsing. "
+            "Check that the Amount column contains numeric sales figures."
+        )
+
+    # ── 5. Build records ───────────────────────────
+    records, dates_found = _build_records(df, col_map)
 
     # ── 6. Compute summary stats ───────────────────
-    total     = sum(r['amount'] for r in records)
+    total     = sum(r['amount_paise'] for r in records)
     customers = len({r['party_name'] for r in records
                      if r['party_name'] not in ('Unknown', '')})
     products  = len({r['product'] for r in records if r['product']})
@@ -340,10 +395,106 @@ def parse_sales_file(filepath: str, ext: str) -> dict:
     return {
         'records':           records,
         'record_count':      len(records),
-        'total_amount':      round(total, 2),
+        'total_amount_paise': total,
         'unique_customers':  customers,
         'unique_products':   products,
         'unique_invoices':   invoices,
         'date_from':         date_from,
         'date_to':           date_to,
     }
+
+
+# ─────────────────────────────────────────────────
+# PREVIEW  — called from routes/main.py before a full ingest
+# Only the head of the upload is read: enough to show which column
+# each field was mapped to and what the parsed rows will look like.
+# ─────────────────────────────────────────────────
+PREVIEW_BYTES = 256 * 1024      # CSV head read from the upload stream
+PREVIEW_SHOWN = 10              # parsed rows returned to the client
+
+
+def _excel_row_count(source, ext: str) -> int:
+    """Sheet height from workbook metadata, without loading the rows."""
+    _rewind(source)
+    if ext == 'xlsx':
+        import openpyxl
+        wb = openpyxl.load_workbook(source, read_only=True)
+        try:
+            return wb.active.max_row or 0
+        finally:
+            wb.close()
+    import xlrd
+    return xlrd.open_workbook(file_contents=source.read(), on_demand=True).sheet_by_index(0).nrows
+
+
+def _preview_row(record) -> dict:
+    """A parsed record as JSON: ISO date, money back in rupees."""
+    row = {k: v for k, v in record.items() if not k.endswith('_paise')}
+    row['sale_date']      = record['sale_date'].isoformat() if record['sale_date'] else None
+    row['price_per_unit'] = rupees(record['price_per_unit_paise'])
+    row['amount']         = rupees(record['amount_paise'])
+    return row
+
+
+def preview_sales_file(stream, ext: str, nrows=200, total_size=None,
+                       mapping=None, header_row=None) -> dict:
+    """
+    Header row, column mapping and a few parsed rows from the first
+    `nrows` data rows of an upload stream, plus an estimate of the total
+    row count. `total_size` is the real file size when `stream` only
+    holds its head. Never raises for a missing Amount column — that is
+    what the preview is for; it shows up as mapping['amount'] = None.
+    """
+    stream.seek(0, io.SEEK_END)
+    size = max(stream.tell(), total_size or 0)
+    stream.seek(0)
+
+    if ext == 'csv':
+        head = stream.read(PREVIEW_BYTES)
+        complete = len(head) >= size
+        if not complete and b'\n' in head:
+            head = head[:head.rfind(b'\n') + 1]      # drop the partial last line
+        source = io.BytesIO(head)
+        lines  = head.count(b'\n') + (bool(head) and not head.endswith(b'\n'))
+    else:
+        # workbooks are zip / OLE containers: the whole (size-capped)
+        # file is needed, but only nrows rows are parsed
+        source   = io.BytesIO(stream.read())
+        complete = False
+        lines    = _excel_row_count(source, ext)
+
+    if header_row is None:
+        header_row = _find_header_row(source, ext)
+    df = _read_frame(source, ext, header_row, nrows=nrows)
+    col_map = _map_columns(df.columns, mapping)
+
+    records, warnings = [], []
+    amount_col = col_map.get('amount')
+    if amount_col:
+        df['_amount'] = _clean_amount(df[amount_col])
+        valid = df[df['_amount'] > 0]
+        records, _ = _build_records(valid.head(PREVIEW_SHOWN), col_map)
+        if valid.empty:
+            warnings.append(f"No positive amounts in '{amount_col}' in the first "
+                            f"{len(df)} rows — is it the right column?")
+    else:
+        warnings.append("No Amount column detected — choose one before uploading.")
+    for field in ('date', 'party_name', 'product'):
+        if not col_map.get(field):
+            warnings.append(f"No column detected for '{field}'.")
+
+    data_lines = max(lines - header_row - 1, 0)
+    if ext == 'csv' and not complete:
+        data_lines = round(data_lines * size / max(len(head), 1))
+    return {
+        'header_row':     header_row,
+        'columns':        list(df.columns),
+        'mapping':        col_map,
+        'fields':         list(COL_ALIASES),
+        'rows': [_preview_row(r) for r in records],
+        'sampled_rows':   len(df),
+        'valid_rows':     int((df['_amount'] > 0).sum()) if amount_col else 0,
+        'estimated_rows': data_lines,
+        'estimate_exact': complete,
+        'warnings':       warnings,
+    }
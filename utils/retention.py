@@ -0,0 +1,220 @@
+import os
+import gzip
+import shutil
+from datetime import datetime
+
+from models import db, Upload, SalesRecord, RetentionPolicy
+from utils import cache
+
+
+# ─────────────────────────────────────────────────
+# RETENTION & COMPACTION
+# Inactive uploads shed weight in steps, each after a per-user number of
+# days since the upload was last active:
+#   • the raw CSV / Excel file is gzipped, later optionally deleted
+#   • its sales_records rows move to a zstd Arrow archive and come back
+#     when the upload is switched to or restored through the API; idle
+#     days then count from the restore, not from the old deactivation
+# and the database file is then vacuumed a bounded number of pages at a
+# time, so it actually shrinks after deletes and archives.
+# Run from cron through `flask --app app retention`.
+# ─────────────────────────────────────────────────
+POLICY_FIELDS = {
+    'compress_raw_days': 'RETENTION_COMPRESS_RAW_DAYS',
+    'delete_raw_days':   'RETENTION_DELETE_RAW_DAYS',
+    'archive_rows_days': 'RETENTION_ARCHIVE_ROWS_DAYS',
+}
+
+
+def upload_paths(folder, stored_name) -> dict:
+    """Every file an upload can have on disk."""
+    from utils.columnar import columnar_path
+    from utils.suggest import suggest_path
+    columnar = columnar_path(folder, stored_name)
+    return {
+        'raw':      os.path.join(folder, stored_name),
+        'raw_gz':   os.path.join(folder, stored_name + '.gz'),
+        'columnar': columnar,
+        'archive':  columnar[:-len('.arrow')] + '.archive.arrow',
+        'suggest':  suggest_path(folder, stored_name),
+    }
+
+
+def effective_policy(policy, config) -> dict:
+    """The user's RetentionPolicy with config defaults filled in."""
+    out = {}
+    for field, key in POLICY_FIELDS.items():
+        value = getattr(policy, field) if policy else None
+        out[field] = config[key] if value is None else value
+    return out
+
+
+def in_window(window, hour) -> bool:
+    """Is `hour` inside a 'start-end' window (may wrap midnight)? Empty = always."""
+    if not window:
+        return True
+    start, end = (int(h) for h in window.split('-'))
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+# ── raw files ─────────────────────────────────────
+def compress_raw(paths) -> int:
+    """gzip the raw upload in place; returns bytes saved."""
+    src, dst = paths['raw'], paths['raw_gz']
+    before = os.path.getsize(src)
+    with open(src, 'rb') as f_in, gzip.open(dst + '.tmp', 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.replace(dst + '.tmp', dst)
+    os.remove(src)
+    return before - os.path.getsize(dst)
+
+
+def delete_raw(paths) -> int:
+    freed = 0
+    for key in ('raw', 'raw_gz'):
+        if os.path.exists(paths[key]):
+            freed += os.path.getsize(paths[key])
+            os.remove(paths[key])
+    return freed
+
+
+# ── rows ──────────────────────────────────────────
+def archive_rows(upload, paths) -> int:
+    """
+    Move an inactive upload's rows into a compressed columnar archive.
+    The archive is written first; rows are only deleted if the upload is
+    still inactive and unarchived when the delete runs.
+    """
+    from utils.columnar import SCHEMA, records_table, write_table
+    cols = [getattr(SalesRecord, name) for name in SCHEMA.names]
+    rows = (SalesRecord.query.filter_by(upload_id=upload.id)
+            .with_entities(*cols).order_by(SalesRecord.id).all())
+    write_table(paths['archive'], records_table([r._asdict() for r in rows]),
+                compression='zstd')
+
+    claimed = (Upload.query
+               .filter_by(id=upload.id, is_active=False, rows_archived=False)
+               .update({'rows_archived': True}, synchronize_session=False))
+    if not claimed:                         # switched to meanwhile
+        db.session.rollback()
+        os.remove(paths['archive'])
+        return 0
+    SalesRecord.query.filter_by(upload_id=upload.id).delete(synchronize_session=False)
+    db.session.commit()
+
+    # the mmap-able copy is rebuilt from the archive on restore
+    if os.path.exists(paths['columnar']):
+        os.remove(paths['columnar'])
+    cache.invalidate_upload(upload.stored_name)
+    return len(rows)
+
+
+def restore_rows(upload, folder) -> int:
+    """Bring an archived upload's rows back into sales_records."""
+    from utils.columnar import read_columnar, write_table
+    paths = upload_paths(folder, upload.stored_name)
+
+    # flipping the flag first serializes concurrent restores: the UPDATE
+    # holds the write lock until the commit, and only the worker whose
+    # UPDATE matched touches the archive
+    claimed = (Upload.query.filter_by(id=upload.id, rows_archived=True)
+               .update({'rows_archived': False, 'last_used_at': datetime.utcnow()},
+                       synchronize_session=False))
+    if not claimed:
+        db.session.rollback()
+        db.session.refresh(upload)
+        return 0
+    try:
+        table = read_columnar(paths['archive'])
+        # in place before the flag flip is visible to readers
+        write_table(paths['columnar'], table)
+        db.session.bulk_insert_mappings(SalesRecord, [
+            {**r, 'upload_id': upload.id} for r in table.to_pylist()
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.refresh(upload)
+
+    os.remove(paths['archive'])
+    cache.invalidate_upload(upload.stored_name)
+    return table.num_rows
+
+
+def ensure_restored(uploads, folder):
+    """Restore any archived upload in `uploads` before it is queried."""
+    for upload in uploads:
+        if upload.rows_archived:
+            restore_rows(upload, folder)
+
+
+def idle_since(upload) -> datetime:
+    """When `upload` was last active or restored."""
+    return max(t for t in (upload.deactivated_at or upload.uploaded_at, upload.last_used_at) if t)
+
+
+# ── the job ───────────────────────────────────────
+def run_retention(config, now=None, dry_run=False):
+    """Apply every user's policy to their inactive uploads; yields one line per action."""
+    now      = now or datetime.utcnow()
+    folder   = config['UPLOAD_FOLDER']
+    policies = {p.user_id: p for p in RetentionPolicy.query}
+
+    def due(days, idle):
+        return bool(days) and idle >= days
+
+    for upload in Upload.query.filter_by(is_active=False).order_by(Upload.id).all():
+        policy = effective_policy(policies.get(upload.user_id), config)
+        idle   = (now - idle_since(upload)).days
+        paths  = upload_paths(folder, upload.stored_name)
+        name   = f'#{upload.id} {upload.original_name} (idle {idle}d)'
+
+        has_raw = os.path.exists(paths['raw']) or os.path.exists(paths['raw_gz'])
+        if due(policy['delete_raw_days'], idle) and has_raw:
+            freed = 0 if dry_run else delete_raw(paths)
+            yield f'🗑  {name}: deleted raw file ({freed / 1e6:.1f} MB)'
+        elif due(policy['compress_raw_days'], idle) and os.path.exists(paths['raw']):
+            saved = 0 if dry_run else compress_raw(paths)
+            yield f'🗜  {name}: compressed raw file (saved {saved / 1e6:.1f} MB)'
+
+        if due(policy['archive_rows_days'], idle) and not upload.rows_archived:
+            rows = upload.record_count if dry_run else archive_rows(upload, paths)
+            yield f'📦 {name}: archived {rows:,} rows'
+
+
+def vacuum(max_pages) -> str:
+    """
+    Return free pages to the filesystem and refresh planner statistics.
+    SQLite frees at most `max_pages` per call (incremental auto_vacuum);
+    the first call on an older file does the one full VACUUM needed to
+    switch it to incremental mode.
+    """
+    engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        raw = engine.raw_connection()           # autocommit: see configure_engines
+        try:
+            cur = raw.cursor()
+            if cur.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                cur.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                cur.execute('VACUUM')
+                done = 'full VACUUM (switched to incremental auto_vacuum)'
+            else:
+                free = cur.execute('PRAGMA freelist_count').fetchone()[0]
+                # frees one page per step; execute() would stop after the first
+                raw.driver_connection.executescript(f'PRAGMA incremental_vacuum({int(max_pages)})')
+                left = cur.execute('PRAGMA freelist_count').fetchone()[0]
+                done = f'incremental vacuum: {free - left:,} of {free:,} free pages released'
+            cur.execute('PRAGMA optimize')           # ANALYZE where statistics are stale
+            cur.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            cur.close()
+        finally:
+            raw.close()
+        return f'🧹 {done}; statistics refreshed'
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.exec_driver_sql('VACUUM (ANALYZE)')
+        else:
+            conn.exec_driver_sql('ANALYZE')
+    return '🧹 VACUUM / ANALYZE done'
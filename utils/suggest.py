@@ -0,0 +1,152 @@
+import os
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# ─────────────────────────────────────────────────
+# TYPEAHEAD PREFIX INDEX
+# At ingest every distinct product and customer of an upload is listed
+# once per word it contains, keyed by its normalized text from that word
+# on: "Rice - Idly Rice" is found by "ri", "idly" and "idly ri". The
+# keys are sorted and written as '<stem>.suggest.arrow' next to the
+# columnar file; a lookup memory-maps it, bisects the range of matching
+# terms and ranks the values they point to by revenue.
+# ─────────────────────────────────────────────────
+FIELDS      = ('product', 'party_name')
+TERM_LENGTH = 64        # longer prefixes are matched on their first 64 chars
+MAX_WORDS   = 8         # word starts indexed per value
+_WORD       = re.compile(r'[^\W_]+')
+_TOP        = '\U0010ffff'
+
+SCHEMA = pa.schema([                                     # sorted by (field, term)
+    ('field',         pa.dictionary(pa.int32(), pa.string())),
+    ('term',          pa.string()),
+    ('value',         pa.dictionary(pa.int32(), pa.string())),
+    ('category',      pa.dictionary(pa.int32(), pa.string())),   # products only
+    ('revenue_paise', pa.int64()),                               # of the value
+])
+
+
+def suggest_path(upload_folder, stored_name):
+    """'<folder>/<stem>.suggest.arrow' for the raw upload `stored_name`."""
+    return os.path.join(upload_folder, os.path.splitext(stored_name)[0] + '.suggest.arrow')
+
+
+def normalize(text) -> str:
+    """Lower-cased, whitespace collapsed — applied to values and queries alike."""
+    return ' '.join(str(text).lower().split())
+
+
+def terms(value) -> set:
+    """The normalized text of `value` from each of its word starts on."""
+    text   = normalize(value)
+    starts = [m.start() for m in _WORD.finditer(text)][:MAX_WORDS] or [0]
+    return {text[i:i + TERM_LENGTH] for i in starts} if text else set()
+
+
+def build_index(records) -> pa.Table:
+    """The SCHEMA table for parsed records (see utils.parser)."""
+    revenue = defaultdict(int)
+    for r in records:
+        revenue['product', r['product'], r['category']] += r['amount_paise']
+        revenue['party_name', r['party_name'], None]    += r['amount_paise']
+
+    rows = sorted(
+        (field, term, value, category, paise)
+        for (field, value, category), paise in revenue.items()
+        if value and value != 'Unknown'
+        for term in terms(value))
+    columns = list(zip(*rows)) or [()] * len(SCHEMA)
+    return pa.Table.from_arrays([
+        pa.array(col, pa.string()).dictionary_encode() if pa.types.is_dictionary(f.type)
+        else pa.array(col, f.type)
+        for f, col in zip(SCHEMA, columns)], schema=SCHEMA)
+
+
+class _Terms:
+    """Sorted Arrow strings as a sequence bisect can search in place."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, i):
+        return self.array[i].as_py()
+
+
+class PrefixIndex:
+    """One upload's sorted terms for one field, with revenue per value."""
+
+    def __init__(self, table: pa.Table, field):
+        t = table.filter(pc.equal(table['field'], field))
+        value, category = t['value'].combine_chunks(), t['category'].combine_chunks()
+        self.terms      = _Terms(t['term'].combine_chunks())
+        self.term_value = value.indices.to_numpy()
+        self.values     = value.dictionary
+        self.categories = category.dictionary
+        # per-value revenue and category code, scattered from the term rows
+        self.revenue  = np.zeros(len(self.values), dtype=np.int64)
+        self.revenue[self.term_value] = t['revenue_paise'].to_numpy()
+        self.category = np.full(len(self.values), -1, dtype=np.int64)
+        self.category[self.term_value] = category.indices.fill_null(-1).to_numpy()
+
+    def match(self, q, category=None, exact=False):
+        """
+        Value codes with a word starting with `q` (every value for ''), or
+        with exact=True the values whose whole normalized text is `q`.
+        """
+        q = normalize(q)[:TERM_LENGTH]
+        if exact:
+            lo  = bisect_left(self.terms, q)
+            hi  = bisect_left(self.terms, q + '\0', lo)
+            idx = np.unique(self.term_value[lo:hi])
+            # a term can also be the tail of a longer value ("organic rice" → "rice")
+            idx = idx[[normalize(v)[:TERM_LENGTH] == q
+                       for v in self.values.take(pa.array(idx, pa.int64())).to_pylist()]] \
+                if len(idx) else idx
+        elif q:
+            lo  = bisect_left(self.terms, q)
+            hi  = bisect_left(self.terms, q + _TOP, lo)
+            idx = np.unique(self.term_value[lo:hi])
+        else:
+            idx = np.unique(self.term_value)
+        if category and category != 'all':
+            code = pc.index(self.categories, category).as_py()
+            idx  = idx[self.category[idx] == code]
+        return idx
+
+    def rows(self, idx):
+        """(value, category, revenue_paise) for value codes `idx`."""
+        codes = self.category[idx]
+        cats  = self.categories.take(pa.array(np.where(codes >= 0, codes, 0))).to_pylist() \
+            if len(self.categories) else [None] * len(idx)
+        return [(v, c if code >= 0 else None, int(p)) for v, c, code, p in zip(
+            self.values.take(pa.array(idx)).to_pylist(), cats, codes, self.revenue[idx])]
+
+
+def top_matches(indexes, q, category=None, limit=10, exact=False) -> list:
+    """(value, category, revenue_paise) of the best matches over one or more uploads."""
+    if len(indexes) == 1:
+        ix  = indexes[0]
+        idx = ix.match(q, category, exact)
+        # everything tied with the limit-th revenue, so ties break by name
+        rev = ix.revenue[idx]
+        if len(idx) > limit:
+            cut = -np.partition(-rev, limit - 1)[limit - 1]
+            idx = idx[rev >= cut]
+        return sorted(ix.rows(idx), key=lambda r: (-r[2], r[0]))[:limit]
+
+    totals, cats = defaultdict(int), {}
+    for ix in indexes:
+        for value, cat, paise in ix.rows(ix.match(q, category, exact)):
+            totals[value] += paise
+            cats.setdefault(value, cat)
+    best = sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+    return [(value, cats[value], paise) for value, paise in best]
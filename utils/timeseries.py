@@ -0,0 +1,88 @@
+import numpy as np
+
+
+# ─────────────────────────────────────────────────
+# TIME BUCKETS
+# Sales are summed per day and series first (SQL can do that straight off
+# the (upload_id, sale_date) index; Arrow groups the date column as is).
+# The days are then floored to their bucket and scattered onto a dense
+# series × bucket grid built with np.arange, so buckets without sales
+# come back as zeros instead of dropping out. Weeks start on Monday.
+# ─────────────────────────────────────────────────
+BUCKETS     = ('day', 'week', 'month', 'quarter')
+MAX_BUCKETS = 5000
+_DAY        = np.timedelta64(1, 'D')
+_WEEK       = np.timedelta64(7, 'D')
+
+
+def bucket_start(days, bucket) -> np.ndarray:
+    """The first day of each day's bucket (datetime64[D] in and out)."""
+    days = np.asarray(days, dtype='datetime64[D]')
+    if bucket == 'day':
+        return days
+    if bucket == 'week':
+        # 1970-01-01 was a Thursday: +3 makes Monday weekday 0
+        return days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    months = days.astype('datetime64[M]')
+    if bucket == 'quarter':
+        n = months.astype(np.int64)
+        months = (n - n % 3).astype('datetime64[M]')
+    return months.astype('datetime64[D]')
+
+
+def bucket_range(first, last, bucket) -> np.ndarray:
+    """Every bucket start from the bucket of `first` to that of `last`."""
+    lo, hi = bucket_start([first, last], bucket)
+    if bucket == 'day':
+        return np.arange(lo, hi + _DAY)
+    if bucket == 'week':
+        return np.arange(lo, hi + _DAY, _WEEK)
+    step = 3 if bucket == 'quarter' else 1
+    months = np.arange(lo.astype('datetime64[M]'), hi.astype('datetime64[M]') + 1, step)
+    return months.astype('datetime64[D]')
+
+
+def bucket_count(first, last, bucket) -> int:
+    """len(bucket_range(...)) without building it."""
+    lo, hi = bucket_start([first, last], bucket)
+    if bucket in ('day', 'week'):
+        return int((hi - lo) // (_DAY if bucket == 'day' else _WEEK)) + 1
+    months = int(hi.astype('datetime64[M]').astype(np.int64) - lo.astype('datetime64[M]').astype(np.int64))
+    return months // (3 if bucket == 'quarter' else 1) + 1
+
+
+def fill(days, keys, columns, bucket, first, last, limit=None):
+    """
+    Sum per-day `columns` (name → array, aligned with `days` and `keys`)
+    onto a zero-filled grid of buckets from `first` to `last`.
+
+    `keys` names the series of each row (None for a single series). Only
+    the `limit` series with the largest first column are kept.
+    Returns (bucket starts, series names, {name: series × bucket array}).
+    """
+    starts = bucket_range(first, last, bucket)
+    days   = np.asarray(days, dtype='datetime64[D]')
+    inside = ~np.isnat(days) & (days >= starts[0]) & (days <= np.datetime64(last, 'D'))
+    days   = days[inside]
+    columns = {name: np.asarray(col)[inside] for name, col in columns.items()}
+
+    if keys is None:
+        names, series = np.array([None], dtype=object), np.zeros(len(days), dtype=np.int64)
+    else:
+        names, series = np.unique(np.asarray(keys, dtype=object)[inside], return_inverse=True)
+    rank_by = next(iter(columns.values()))
+    totals  = np.bincount(series, weights=rank_by, minlength=len(names))
+    order   = np.lexsort((np.arange(len(names)), -totals))[:limit]
+
+    # old series code → row in the grid, -1 for series cut by `limit`
+    row = np.full(len(names), -1, dtype=np.int64)
+    row[order] = np.arange(len(order))
+    keep = row[series] >= 0
+    at   = (row[series][keep], np.searchsorted(starts, bucket_start(days[keep], bucket)))
+
+    grids = {}
+    for name, col in columns.items():
+        grid = np.zeros((len(order), len(starts)), dtype=col.dtype)
+        np.add.at(grid, at, col[keep])
+        grids[name] = grid
+    return starts, names[order], grids